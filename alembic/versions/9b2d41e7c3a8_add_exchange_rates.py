@@ -0,0 +1,34 @@
+"""Add exchange_rates
+
+Revision ID: 9b2d41e7c3a8
+Revises: 5f0c103f99c5
+Create Date: 2026-10-18 10:12:37.418205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '9b2d41e7c3a8'
+down_revision: Union[str, None] = '5f0c103f99c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('exchange_rates',
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('rate', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('date', 'currency')
+    )
+    op.create_index('ix_exchange_rates_currency_date', 'exchange_rates', ['currency', 'date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_exchange_rates_currency_date', table_name='exchange_rates')
+    op.drop_table('exchange_rates')
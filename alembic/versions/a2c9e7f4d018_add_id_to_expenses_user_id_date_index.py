@@ -0,0 +1,36 @@
+"""Add id to the (user_id, date) expenses index key
+
+Revision ID: a2c9e7f4d018
+Revises: f3a8c1d5e927
+Create Date: 2026-10-18 20:04:33.180265
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a2c9e7f4d018'
+down_revision: Union[str, None] = 'f3a8c1d5e927'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Звіт і сторінки сортуються за (date, id): з id у ключі індексу окреме сортування не потрібне
+    op.drop_index('ix_expenses_user_id_date', table_name='expenses')
+    op.create_index(
+        'ix_expenses_user_id_date_id', 'expenses', ['user_id', 'date', 'id'], unique=False,
+        postgresql_include=['name', 'uah', 'usd']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_expenses_user_id_date_id', table_name='expenses')
+    op.create_index(
+        'ix_expenses_user_id_date', 'expenses', ['user_id', 'date'], unique=False,
+        postgresql_include=['id', 'name', 'uah', 'usd']
+    )
@@ -0,0 +1,106 @@
+"""Partition expenses by month
+
+Revision ID: b52c8e07d913
+Revises: a7d3e9f1b254
+Create Date: 2026-10-18 16:22:09.604215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'b52c8e07d913'
+down_revision: Union[str, None] = 'a7d3e9f1b254'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Місячні секції expenses_YYYY_MM; рядки з дефолтної секції переносяться в нову перед ATTACH
+ENSURE_PARTITIONS_SQL = """
+CREATE OR REPLACE FUNCTION ensure_expense_partitions(first_month date, last_month date) RETURNS integer AS $$
+DECLARE
+    month_start date := date_trunc('month', first_month)::date;
+    month_end date;
+    partition_name text;
+    created integer := 0;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('ensure_expense_partitions'));
+    WHILE month_start <= last_month LOOP
+        month_end := (month_start + interval '1 month')::date;
+        partition_name := 'expenses_' || to_char(month_start, 'YYYY_MM');
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I (LIKE expenses INCLUDING DEFAULTS)', partition_name);
+            EXECUTE format(
+                'WITH moved AS (DELETE FROM expenses_default WHERE date >= %L AND date < %L RETURNING *) '
+                'INSERT INTO %I SELECT * FROM moved', month_start, month_end, partition_name
+            );
+            EXECUTE format(
+                'ALTER TABLE expenses ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, month_end
+            );
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("ALTER TABLE expenses RENAME TO expenses_old")
+    op.execute("ALTER TABLE expenses_old RENAME CONSTRAINT expenses_pkey TO expenses_old_pkey")
+    op.execute("DROP INDEX ix_expenses_user_id_date")
+    op.execute("DROP INDEX ix_expenses_id")
+    op.execute("ALTER SEQUENCE expenses_id_seq OWNED BY NONE")
+    # Ключ секціонування не може бути NULL
+    op.execute("UPDATE expenses_old SET date = coalesce(created_at, now()) WHERE date IS NULL")
+
+    op.execute("CREATE TABLE expenses (LIKE expenses_old INCLUDING DEFAULTS) PARTITION BY RANGE (date)")
+    op.execute("ALTER TABLE expenses ALTER COLUMN date SET NOT NULL")
+    # Унікальність у секціонованій таблиці можлива лише разом з ключем секціонування
+    op.execute("ALTER TABLE expenses ADD CONSTRAINT expenses_pkey PRIMARY KEY (id, date)")
+    op.execute("ALTER TABLE expenses ADD CONSTRAINT expenses_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id)")
+    op.execute("ALTER SEQUENCE expenses_id_seq OWNED BY expenses.id")
+    op.execute("CREATE TABLE expenses_default PARTITION OF expenses DEFAULT")
+
+    op.execute(ENSURE_PARTITIONS_SQL)
+    # Секції - не раніше ніж за 5 років: поодинокі старі рядки (опечатки в році) лишаються в expenses_default
+    op.execute(
+        "SELECT ensure_expense_partitions(greatest(coalesce(min(date), now()), now() - interval '5 years')::date, "
+        "(date_trunc('month', now()) + interval '3 months')::date) FROM expenses_old"
+    )
+    op.execute("INSERT INTO expenses SELECT * FROM expenses_old")
+    op.execute("DROP TABLE expenses_old")
+
+    # Індекси на батьківській таблиці створюються в кожній секції, зокрема в нових.
+    # Окремий ix_expenses_id не потрібен: первинний ключ (id, date) починається з id
+    op.execute(
+        "CREATE INDEX ix_expenses_user_id_date ON expenses (user_id, date) INCLUDE (id, name, uah, usd)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Архівовані (від'єднані) секції не повертаються: їх треба відновити до downgrade
+    op.execute("ALTER TABLE expenses RENAME TO expenses_partitioned")
+    op.execute("ALTER TABLE expenses_partitioned RENAME CONSTRAINT expenses_pkey TO expenses_partitioned_pkey")
+    op.execute("ALTER SEQUENCE expenses_id_seq OWNED BY NONE")
+    op.execute("DROP INDEX ix_expenses_user_id_date")
+
+    op.execute("CREATE TABLE expenses (LIKE expenses_partitioned INCLUDING DEFAULTS)")
+    op.execute("ALTER TABLE expenses ALTER COLUMN date DROP NOT NULL")
+    op.execute("INSERT INTO expenses SELECT * FROM expenses_partitioned")
+    op.execute("DROP TABLE expenses_partitioned CASCADE")
+    op.execute("DROP FUNCTION ensure_expense_partitions(date, date)")
+
+    op.execute("ALTER TABLE expenses ADD CONSTRAINT expenses_pkey PRIMARY KEY (id)")
+    op.execute("ALTER TABLE expenses ADD CONSTRAINT expenses_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id)")
+    op.execute("ALTER SEQUENCE expenses_id_seq OWNED BY expenses.id")
+    op.create_index('ix_expenses_id', 'expenses', ['id'], unique=False)
+    op.create_index(
+        'ix_expenses_user_id_date', 'expenses', ['user_id', 'date'], unique=False,
+        postgresql_include=['id', 'name', 'uah', 'usd']
+    )
@@ -0,0 +1,30 @@
+"""Add covering (user_id, date) index on expenses
+
+Revision ID: c4f7a2d9e611
+Revises: 9b2d41e7c3a8
+Create Date: 2026-10-18 11:03:52.906114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c4f7a2d9e611'
+down_revision: Union[str, None] = '9b2d41e7c3a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_expenses_user_id_date', 'expenses', ['user_id', 'date'], unique=False,
+        postgresql_include=['id', 'name', 'uah', 'usd']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_expenses_user_id_date', table_name='expenses')
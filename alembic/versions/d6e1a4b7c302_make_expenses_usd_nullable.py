@@ -0,0 +1,29 @@
+"""Make expenses.usd nullable
+
+Revision ID: d6e1a4b7c302
+Revises: b52c8e07d913
+Create Date: 2026-10-18 18:03:51.274630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'd6e1a4b7c302'
+down_revision: Union[str, None] = 'b52c8e07d913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Без курсу долара витрата зберігається з usd = NULL
+    op.alter_column('expenses', 'usd', existing_type=sa.Float(), nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("UPDATE expenses SET usd = 0 WHERE usd IS NULL")
+    op.alter_column('expenses', 'usd', existing_type=sa.Float(), nullable=False)
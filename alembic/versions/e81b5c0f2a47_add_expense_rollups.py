@@ -0,0 +1,40 @@
+"""Add expense_rollups
+
+Revision ID: e81b5c0f2a47
+Revises: c4f7a2d9e611
+Create Date: 2026-10-18 12:40:18.551930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'e81b5c0f2a47'
+down_revision: Union[str, None] = 'c4f7a2d9e611'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('expense_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('uah_total', sa.Float(), nullable=False),
+    sa.Column('usd_total', sa.Float(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'month')
+    )
+    op.execute(
+        "INSERT INTO expense_rollups (user_id, month, uah_total, usd_total, count) "
+        "SELECT user_id, date_trunc('month', date)::date, sum(uah), coalesce(sum(usd), 0), count(*) "
+        "FROM expenses WHERE user_id IS NOT NULL AND date IS NOT NULL GROUP BY 1, 2"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('expense_rollups')
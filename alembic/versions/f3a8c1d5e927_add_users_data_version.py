@@ -0,0 +1,28 @@
+"""Add users.data_version
+
+Revision ID: f3a8c1d5e927
+Revises: d6e1a4b7c302
+Create Date: 2026-10-18 19:12:07.518342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'f3a8c1d5e927'
+down_revision: Union[str, None] = 'd6e1a4b7c302'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Лічильник змін витрат користувача: ключ кешу звітів і ETag, спільний для всіх процесів
+    op.add_column('users', sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'data_version')
@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import hmac
+import json
+from datetime import datetime, date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.config import API_TOKEN, API_PAGE_LIMIT, PROFILE_MAX_SECONDS
+from database import get_async_db
+from profiling import profiler
+from rate_history import usd_rate_for
+from routers import get_expense_page, get_expense_by_id, post_expenses, update_expense, delete_expense, \
+    get_expense_totals, get_expense_stats, get_data_version, encode_cursor, decode_cursor
+from schemas import ExpenseOut, ExpensePageOut, ExpenseCreate, ExpenseUpdate, ExpenseSummary
+
+EXPENSE_FIELDS = set(ExpenseOut.model_fields)
+
+
+def require_api_token(x_api_key: str = Header(None)):
+    if not API_TOKEN or not hmac.compare_digest(x_api_key or "", API_TOKEN):
+        raise HTTPException(status_code=401, detail="Невірний API ключ")
+
+
+router = APIRouter(prefix="/api", tags=["expenses"], dependencies=[Depends(require_api_token)])
+
+
+def json_response(content: bytes, status_code: int = 200, etag: str = None):
+    headers = {"ETag": etag} if etag else None
+    return Response(content=content, status_code=status_code, media_type="application/json", headers=headers)
+
+
+async def make_etag(db: AsyncSession, telegram_id: int, request: Request):
+    # Версія даних користувача + параметри запиту: інші поля чи сторінка - інший ETag
+    query = hashlib.sha1(str(request.url.query).encode()).hexdigest()[:12]
+    return f'W/"{await get_data_version(db, telegram_id)}-{query}"'
+
+
+def not_modified(request: Request, etag: str):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
+def parse_fields(fields: Optional[str]):
+    if not fields:
+        return None
+    selected = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = selected - EXPENSE_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Невідомі поля: {', '.join(sorted(unknown))}")
+    return selected
+
+
+def day_start(day: Optional[date]):
+    return datetime(day.year, day.month, day.day) if day else None
+
+
+@router.get("/users/{telegram_id}/expenses")
+async def list_expenses(
+    telegram_id: int,
+    request: Request,
+    limit: int = Query(50, ge=1, le=API_PAGE_LIMIT),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    etag = await make_etag(db, telegram_id, request)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    selected = parse_fields(fields)
+    try:
+        cursor_key = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Невірний cursor")
+
+    rows, has_older, _ = await get_expense_page(
+        db, telegram_id, "older" if cursor_key else "first", cursor_key, limit=limit,
+        start_date=day_start(start), end_date=day_start(end)
+    )
+
+    page = ExpensePageOut(
+        items=[ExpenseOut.model_validate(row) for row in rows],
+        next_cursor=encode_cursor(rows[-1]) if has_older else None
+    )
+    include = {"items": {"__all__": selected}, "next_cursor": True} if selected else None
+    # model_dump_json серіалізує одразу в байти JSON у pydantic-core, без проміжних dict
+    return json_response(page.model_dump_json(include=include).encode(), etag=etag)
+
+
+@router.get("/users/{telegram_id}/summary")
+async def expenses_summary(
+    telegram_id: int,
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    etag = await make_etag(db, telegram_id, request)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    totals = await get_expense_totals(db, telegram_id, day_start(start), day_start(end))
+    return json_response(ExpenseSummary(**totals).model_dump_json().encode(), etag=etag)
+
+
+@router.get("/users/{telegram_id}/stats")
+async def expenses_stats(telegram_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    etag = await make_etag(db, telegram_id, request)
+    cached = not_modified(request, etag)
+    if cached is not None:
+        return cached
+
+    stats = await get_expense_stats(db, telegram_id)
+    if isinstance(stats, str):
+        raise HTTPException(status_code=404, detail=stats)
+    return json_response(json.dumps(stats, ensure_ascii=False).encode(), etag=etag)
+
+
+@router.post("/users/{telegram_id}/expenses", status_code=201)
+async def create_expense(telegram_id: int, expense: ExpenseCreate, db: AsyncSession = Depends(get_async_db)):
+    usd_rate = await usd_rate_for(expense.date)
+    values = {
+        "name": expense.name,
+        "date": day_start(expense.date),
+        "uah": expense.uah,
+        "usd": round(expense.uah / usd_rate, 2) if usd_rate else None,
+    }
+
+    created = await post_expenses(db, telegram_id, [values])
+    if isinstance(created, str):
+        raise HTTPException(status_code=404, detail=created)
+
+    return json_response(ExpenseOut(id=created[0], **values).model_dump_json().encode(), status_code=201)
+
+
+@router.patch("/users/{telegram_id}/expenses/{expense_id}")
+async def edit_expense(telegram_id: int, expense_id: int, expense: ExpenseUpdate,
+                       db: AsyncSession = Depends(get_async_db)):
+    current = await get_expense_by_id(db, telegram_id, expense_id)
+    if not isinstance(current, dict):
+        raise HTTPException(status_code=404, detail=current)
+
+    expense_date = datetime.strptime(current["Дата"], "%d.%m.%Y")
+    usd_rate = await usd_rate_for(expense_date.date())
+    result = await update_expense(db, telegram_id, expense_id, expense.name, expense.uah, usd_rate, expense_date)
+    if result != "Витрата успішно оновлена":
+        raise HTTPException(status_code=404, detail=result)
+
+    updated = ExpenseOut(
+        id=expense_id, name=expense.name, date=expense_date, uah=expense.uah,
+        usd=round(expense.uah / usd_rate, 2) if usd_rate else None
+    )
+    return json_response(updated.model_dump_json().encode())
+
+
+@router.delete("/users/{telegram_id}/expenses/{expense_id}", status_code=204)
+async def remove_expense(telegram_id: int, expense_id: int, db: AsyncSession = Depends(get_async_db)):
+    if not await delete_expense(db, telegram_id, expense_id):
+        raise HTTPException(status_code=404, detail="Витрата не знайдена")
+    return Response(status_code=204)
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile_process(seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS)):
+    # Collapsed-стеки процесу FastAPI (і бота в режимі одного процесу) для flamegraph
+    if profiler.running:
+        raise HTTPException(status_code=409, detail="Профілювання вже виконується")
+    try:
+        return await asyncio.to_thread(profiler.run, seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -0,0 +1,115 @@
+import argparse
+import asyncio
+import itertools
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+
+from aiohttp import web
+
+BOT_USER = {"id": 1000000001, "is_bot": True, "first_name": "Load Test Bot", "username": "load_test_bot"}
+USD_RATE = 41.25
+# Дрібна сторінка у форматі, який розбирає HtmlRateProvider
+MINFIN_HTML = f'<div class="sc-1x32wa2-9 bKmKjX">{USD_RATE}</div>'
+
+
+# Локальна заміна Bot API: відповідає на виклики бота і запам'ятовує надіслані повідомлення
+class FakeTelegram:
+    def __init__(self):
+        self.replies = defaultdict(list)
+        self.calls = Counter()
+        self._ids = itertools.count(1)
+        self._thread = None
+        self._loop = None
+        self._runner = None
+
+    def message(self, chat_id: int, text: str = None, reply_markup: str = None, message_id: int = None, **extra):
+        message = {
+            "message_id": message_id or next(self._ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            **extra,
+        }
+        if text is not None:
+            message["text"] = text
+        if reply_markup:
+            markup = json.loads(reply_markup)
+            if "inline_keyboard" in markup:
+                message["reply_markup"] = markup
+        self.replies[chat_id].append(message)
+        return message
+
+    async def handle(self, request: web.Request):
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        # aiogram надсилає всі запити як multipart/form-data
+        params = await request.post()
+        chat_id = int(params["chat_id"]) if "chat_id" in params else None
+
+        if method == "getMe":
+            result = BOT_USER
+        elif method == "sendMessage":
+            result = self.message(chat_id, params.get("text"), params.get("reply_markup"))
+        elif method == "editMessageText":
+            result = self.message(
+                chat_id, params.get("text"), params.get("reply_markup"), message_id=int(params["message_id"])
+            )
+        elif method == "sendDocument":
+            file_id = f"document-{next(self._ids)}"
+            result = self.message(chat_id, document={
+                "file_id": file_id, "file_unique_id": file_id, "file_name": "expense_report.xlsx"
+            })
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def nbu(self, request: web.Request):
+        return web.json_response([{"r030": 840, "cc": "USD", "rate": USD_RATE}])
+
+    async def minfin(self, request: web.Request):
+        return web.Response(text=MINFIN_HTML, content_type="text/html")
+
+    def app(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        app.router.add_get("/rates/nbu", self.nbu)
+        app.router.add_get("/rates/minfin", self.minfin)
+        return app
+
+    async def serve(self, host: str, port: int):
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    def start_in_thread(self, host: str = "127.0.0.1", port: int = 8081):
+        # Власний цикл подій: сервер не змішується з навантаженням бота, яке вимірюється
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self.serve(host, port))
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="fake-telegram", daemon=True)
+        self._thread.start()
+        started.wait()
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Тестовий Bot API сервер (TELEGRAM_API_URL=http://host:port)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+
+    web.run_app(FakeTelegram().app(), host=args.host, port=args.port)
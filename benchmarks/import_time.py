@@ -0,0 +1,56 @@
+import argparse
+import json
+import re
+import subprocess
+import sys
+
+# Ці модулі потрібні лише при першому звіті, імпорті файлу чи резервному джерелі курсу
+HEAVY_MODULES = ("pandas", "numpy", "selenium", "undetected_chromedriver", "openpyxl", "xlsxwriter")
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def measure(module: str):
+    # Окремий процес з -X importtime: кеш модулів поточного процесу не впливає на результат
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+
+    modules = {}
+    for line in completed.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = {"self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000,
+                             "top_level": len(indent) <= 1}
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Час імпорту застосунку (python -X importtime) відносно бюджету")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    modules = measure(args.module)
+    total_ms = sum(info["cumulative_ms"] for info in modules.values() if info["top_level"])
+    heavy = sorted(name for name in modules if name.split(".")[0] in HEAVY_MODULES)
+    slowest = sorted(modules.items(), key=lambda item: item[1]["self_ms"], reverse=True)[:args.top]
+
+    result = {
+        "module": args.module,
+        "total_ms": round(total_ms, 1),
+        "budget_ms": args.budget_ms,
+        "heavy_imports": sorted({name.split(".")[0] for name in heavy}),
+        "slowest_self_ms": {name: round(info["self_ms"], 1) for name, info in slowest},
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    ok = total_ms <= args.budget_ms and not heavy
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
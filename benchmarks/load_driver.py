@@ -0,0 +1,218 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from benchmarks.fake_telegram import FakeTelegram
+
+FIRST_USER_ID = 9_000_000_000
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50), 2),
+        "p95_ms": round(percentile(values, 95), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+        "max_ms": round(max(values), 2) if values else 0.0,
+    }
+
+
+def configure(api_url: str):
+    # bot.config читає змінні при імпорті: все задається до імпорту bot.run
+    os.environ["TOKEN"] = "123456:LOAD-TEST"
+    os.environ["TELEGRAM_API_URL"] = api_url
+    os.environ["RATE_MINFIN_URL"] = f"{api_url}/rates/minfin"
+    os.environ["RATE_NBU_URL"] = f"{api_url}/rates/nbu"
+    # Віртуальні користувачі діють швидше за людей; обмеження можна повернути через змінні оточення
+    os.environ.setdefault("THROTTLE_RATE", "1000")
+    os.environ.setdefault("THROTTLE_BURST", "1000")
+
+
+class VirtualUser:
+    def __init__(self, driver, user_id: int):
+        self.driver = driver
+        self.user_id = user_id
+        self.user = {"id": user_id, "is_bot": False, "first_name": f"Load {user_id}", "username": f"load{user_id}"}
+
+    async def send(self, step: str, text: str):
+        await self.driver.feed(step, {
+            "message": {
+                "message_id": self.driver.next_id(),
+                "date": int(time.time()),
+                "chat": {"id": self.user_id, "type": "private"},
+                "from": self.user,
+                "text": text,
+            }
+        })
+
+    async def press(self, step: str, prefix: str):
+        # Кнопка з останнього повідомлення бота з inline-клавіатурою
+        message = next((m for m in reversed(self.driver.fake.replies[self.user_id]) if "reply_markup" in m), None)
+        buttons = [button for row in (message or {}).get("reply_markup", {}).get("inline_keyboard", [])
+                   for button in row if button.get("callback_data", "").startswith(prefix)]
+        if not buttons:
+            self.driver.record_error(step, "no_button")
+            return False
+
+        await self.driver.feed(step, {
+            "callback_query": {
+                "id": str(self.driver.next_id()),
+                "from": self.user,
+                "chat_instance": str(self.user_id),
+                "message": message,
+                "data": buttons[0]["callback_data"],
+            }
+        })
+        return True
+
+    async def run(self):
+        today = datetime.now().strftime("%d.%m.%Y")
+        await self.send("start", "/start")
+
+        await self.send("add_menu", "Додати статтю витрат")
+        await self.send("add_name", "Навантажувальний тест")
+        await self.send("add_date", today)
+        await self.send("add_amount", "1369")
+
+        await self.send("report_menu", "Отримати звіт витрат")
+        await self.send("report_start", today)
+        await self.send("report_end", today)
+
+        await self.send("edit_menu", "Відредагувати статтю витрат")
+        if await self.press("edit_pick", "expense:edit:"):
+            await self.send("edit_save", "Оновлена витрата, 1500")
+
+        await self.send("delete_menu", "Видалити статтю витрат")
+        if await self.press("delete_pick", "expense:delete:"):
+            await self.press("delete_confirm", "expense:confirm:")
+
+
+class LoadDriver:
+    def __init__(self, fake: FakeTelegram, bot, dp):
+        self.fake = fake
+        self.bot = bot
+        self.dp = dp
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self._update_id = 0
+
+    def next_id(self):
+        self._update_id += 1
+        return self._update_id
+
+    def record_error(self, step: str, kind: str):
+        self.errors[step][kind] += 1
+
+    async def feed(self, step: str, payload: dict):
+        from aiogram.dispatcher.event.bases import UNHANDLED
+        from aiogram.types import Update
+
+        update = Update.model_validate({"update_id": self.next_id(), **payload}, context={"bot": self.bot})
+        started = time.perf_counter()
+        try:
+            result = await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            self.record_error(step, type(e).__name__)
+            return
+        finally:
+            self.latencies[step].append((time.perf_counter() - started) * 1000)
+        if result is UNHANDLED:
+            self.record_error(step, "unhandled")
+
+
+async def watch_loop_lag(lags: list, interval: float = 0.01):
+    # Наскільки пізніше за заплановане прокидається цикл подій: ознака блокуючого коду
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, (time.perf_counter() - started - interval) * 1000))
+
+
+async def run(args, fake: FakeTelegram):
+    from bot.run import get_bot, dp, on_startup, on_shutdown
+    from profiling import profiler
+
+    bot = get_bot()
+    driver = LoadDriver(fake, bot, dp)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def run_user(index: int):
+        async with semaphore:
+            await VirtualUser(driver, FIRST_USER_ID + index).run()
+
+    background = await on_startup()
+    lags = []
+    lag_task = asyncio.create_task(watch_loop_lag(lags))
+    profile = asyncio.create_task(asyncio.to_thread(profiler.run, args.profile)) if args.profile else None
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_user(index) for index in range(args.users)))
+        elapsed = time.perf_counter() - started
+    finally:
+        lag_task.cancel()
+        await on_shutdown(background)
+        await bot.session.close()
+
+    updates = sum(len(values) for values in driver.latencies.values())
+    errors = sum(sum(kinds.values()) for kinds in driver.errors.values())
+    all_latencies = [value for values in driver.latencies.values() for value in values]
+    result = {
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "updates": updates,
+        "updates_per_s": round(updates / elapsed, 1),
+        "error_rate": round(errors / updates, 4) if updates else 0.0,
+        "handler": summarize(all_latencies),
+        "steps": {step: summarize(values) for step, values in driver.latencies.items()},
+        "errors": {step: dict(kinds) for step, kinds in driver.errors.items()},
+        "loop_lag": summarize(lags),
+        "api_calls": dict(fake.calls),
+    }
+    if profile is not None:
+        with open(args.profile_output, "w", encoding="utf-8") as f:
+            f.write(await profile)
+        result["profile"] = args.profile_output
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Віртуальні користувачі проходять додавання, звіт, редагування і видалення через Dispatcher"
+    )
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8081, help="Порт тестового Bot API сервера")
+    parser.add_argument("--profile", type=int, help="Профілювати перші N секунд навантаження")
+    parser.add_argument("--profile-output", default="load.collapsed")
+    parser.add_argument("--output", help="Зберегти результат у JSON")
+    args = parser.parse_args()
+
+    fake = FakeTelegram()
+    configure(fake.start_in_thread(port=args.port))
+    try:
+        result = asyncio.run(run(args, fake))
+    finally:
+        fake.stop()
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return 1 if result["error_rate"] > 0.01 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
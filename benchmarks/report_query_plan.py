@@ -0,0 +1,112 @@
+import argparse
+import json
+import sys
+
+from sqlalchemy import func, select, text
+
+from database import engine
+from models import Expense
+from routers import report_query
+
+
+def old_report_queries(user_id: int):
+    # Як було раніше: рядки і дві окремі суми - три проходи по таблиці
+    return [
+        select(Expense).where(Expense.user_id == user_id),
+        select(func.sum(Expense.uah)).where(Expense.user_id == user_id),
+        select(func.sum(Expense.usd)).where(Expense.user_id == user_id),
+    ]
+
+
+def explain(conn, stmt):
+    compiled = stmt.compile(dialect=conn.dialect)
+    plan = conn.exec_driver_sql(
+        "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + str(compiled), compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def summarize(plan):
+    nodes = list(plan_nodes(plan["Plan"]))
+    return {
+        "execution_ms": plan["Execution Time"],
+        "shared_buffers": sum(n.get("Shared Hit Blocks", 0) + n.get("Shared Read Blocks", 0) for n in nodes),
+        "scans": sorted({f"{n['Node Type']}:{n.get('Index Name', n.get('Relation Name', ''))}"
+                         for n in nodes if "Scan" in n["Node Type"]}),
+        # Sort або Incremental Sort означає, що порядок (date, id) не береться з індексу
+        "sorts": [n["Node Type"] for n in nodes if "Sort" in n["Node Type"]],
+        "seq_scans": [n["Relation Name"] for n in nodes if n["Node Type"] == "Seq Scan"],
+    }
+
+
+def seed(conn, rows: int):
+    user_id = conn.execute(text(
+        "INSERT INTO users (telegram_id, username) VALUES (-1 * (extract(epoch from now())::bigint), 'plan_check') "
+        "RETURNING id"
+    )).scalar()
+    conn.execute(text(
+        "INSERT INTO expenses (user_id, name, date, uah, usd, created_at) "
+        "SELECT :user_id, 'Стаття ' || (g % 50), now() - (g % 1500) * interval '1 day', "
+        "(g % 5000) + 1, ((g % 5000) + 1) / 41.0, now() FROM generate_series(1, :rows) g"
+    ), {"user_id": user_id, "rows": rows})
+    conn.execute(text("ANALYZE expenses"))
+    return user_id
+
+
+def heavy_users(conn, min_rows: int):
+    return conn.execute(text(
+        "SELECT user_id FROM expenses GROUP BY user_id HAVING count(*) >= :min_rows ORDER BY count(*) DESC LIMIT 3"
+    ), {"min_rows": min_rows}).scalars().all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Плани запитів звіту для користувачів з великою кількістю витрат")
+    parser.add_argument("--min-rows", type=int, default=100_000)
+    parser.add_argument("--user-id", type=int, action="append")
+    parser.add_argument("--seed", type=int, help="Створити тестового користувача з вказаною кількістю витрат")
+    args = parser.parse_args()
+
+    ok = True
+    # Транзакція не комітиться: тестові дані з --seed не залишаються в базі
+    with engine.connect() as conn:
+        if args.seed:
+            user_ids = [seed(conn, args.seed)]
+        else:
+            user_ids = args.user_id or heavy_users(conn, args.min_rows)
+
+        if not user_ids:
+            print(f"Немає користувачів з {args.min_rows}+ витратами. Використайте --seed {args.min_rows}.")
+            return 1
+
+        for user_id in user_ids:
+            before = [summarize(explain(conn, stmt)) for stmt in old_report_queries(user_id)]
+            after = summarize(explain(conn, report_query(user_id)))
+            # Індекси секцій мають власні імена, тому перевіряється відсутність Seq Scan і сортування
+            uses_index = not after["seq_scans"]
+            ok = ok and uses_index and not after["sorts"]
+
+            print(json.dumps({
+                "user_id": user_id,
+                "before": {
+                    "statements": before,
+                    "execution_ms": round(sum(p["execution_ms"] for p in before), 2),
+                    "shared_buffers": sum(p["shared_buffers"] for p in before),
+                },
+                "after": after,
+                "uses_index": uses_index,
+                "needs_sort": bool(after["sorts"]),
+            }, ensure_ascii=False, indent=2))
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Курс не запитується з мережі: роутери отримують його аргументом, тут - фіксоване значення
+USD_RATE = 41.0
+OPERATIONS = ("post_expense", "get_expenses", "get_expenses_all", "update_expense", "delete_expense")
+
+SEED_SQL = {
+    "postgresql": (
+        "INSERT INTO expenses (user_id, name, date, uah, usd, created_at) "
+        "SELECT :user_id, 'Стаття ' || (g % 50), date_trunc('day', now()) - (g % 1500) * interval '1 day', "
+        "(g % 5000) + 1, round((((g % 5000) + 1) / :rate)::numeric, 2), now() "
+        "FROM generate_series(1, :rows) g"
+    ),
+    "sqlite": (
+        "WITH RECURSIVE g(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM g WHERE n < :rows) "
+        "INSERT INTO expenses (user_id, name, date, uah, usd, created_at) "
+        "SELECT :user_id, 'Стаття ' || (n % 50), datetime(date('now'), '-' || (n % 1500) || ' days'), "
+        "(n % 5000) + 1, round(((n % 5000) + 1) / :rate, 2), datetime('now') FROM g"
+    ),
+}
+
+
+def configure_database(url: str):
+    # database.py читає адресу при імпорті, тому змінні задаються до імпорту роутерів
+    os.environ["DATABASE_URL"] = url
+    if url.startswith("sqlite"):
+        os.environ["ASYNC_DATABASE_URL"] = url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    else:
+        os.environ["ASYNC_DATABASE_URL"] = url.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+
+def seed_user(engine, telegram_id: int, rows: int):
+    from sqlalchemy import text
+    from rollups import rollup_sql
+
+    dialect = engine.dialect.name
+    with engine.begin() as conn:
+        user_id = conn.execute(
+            text("INSERT INTO users (telegram_id, username) VALUES (:telegram_id, 'bench') RETURNING id"),
+            {"telegram_id": telegram_id}
+        ).scalar()
+        conn.execute(text(SEED_SQL[dialect]), {"user_id": user_id, "rows": rows, "rate": USD_RATE})
+        conn.execute(text(
+            "INSERT INTO expense_rollups (user_id, month, uah_total, usd_total, count) "
+            + rollup_sql(dialect, "AND user_id = :user_id")
+        ), {"user_id": user_id})
+        expense_ids = conn.execute(
+            text("SELECT id FROM expenses WHERE user_id = :user_id ORDER BY random() LIMIT 1000"),
+            {"user_id": user_id}
+        ).scalars().all()
+    if dialect == "postgresql":
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE expenses"))
+    return user_id, expense_ids
+
+
+async def measure(fn, repeat: int):
+    timings = []
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    for i in range(repeat):
+        started = time.perf_counter()
+        await fn(i)
+        timings.append((time.perf_counter() - started) * 1000)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "median_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+        "min_ms": round(timings[0], 2),
+        "peak_mb": round(peak / 1024 / 1024, 2),
+    }
+
+
+async def bench_size(telegram_id: int, rows: int, repeat: int):
+    from database import AsyncSessionLocal, engine
+    from report_writer import ReportFile
+    from routers import post_expense, get_expenses, get_expenses_all, update_expense, delete_expense, \
+        resolve_user_id, bump_data_version
+
+    started = time.perf_counter()
+    _, expense_ids = await asyncio.to_thread(seed_user, engine, telegram_id, rows)
+    seed_seconds = round(time.perf_counter() - started, 2)
+    today = datetime.now()
+
+    async def run_post(i):
+        async with AsyncSessionLocal() as db:
+            amount = random.randint(1, 5000)
+            await post_expense(db, telegram_id, {
+                "name": f"Бенчмарк {i}", "date": today.strftime("%d.%m.%Y"),
+                "amount": amount, "amount_usd": round(amount / USD_RATE, 2),
+            })
+
+    async def run_report(fn, *args):
+        # Нова версія даних: кеш звітів не використовується, вимірюється саме формування
+        async with AsyncSessionLocal() as db:
+            await bump_data_version(db, await resolve_user_id(db, telegram_id))
+            await db.commit()
+            report = await fn(db, telegram_id, *args)
+        if isinstance(report, ReportFile):
+            report.discard()
+        elif isinstance(report, str):
+            raise RuntimeError(report)
+
+    async def run_period(i):
+        await run_report(get_expenses, (today - timedelta(days=90)).strftime("%d.%m.%Y"), today.strftime("%d.%m.%Y"))
+
+    async def run_all(i):
+        await run_report(get_expenses_all)
+
+    async def run_update(i):
+        async with AsyncSessionLocal() as db:
+            await update_expense(db, telegram_id, expense_ids[i % len(expense_ids)], f"Оновлено {i}",
+                                 random.randint(1, 5000), USD_RATE)
+
+    async def run_delete(i):
+        # Видаляються інші витрати, ніж ті, що оновлювалися
+        async with AsyncSessionLocal() as db:
+            await delete_expense(db, telegram_id, expense_ids[-(i % len(expense_ids)) - 1])
+
+    results = {"seed_seconds": seed_seconds}
+    for name, fn in zip(OPERATIONS, (run_post, run_period, run_all, run_update, run_delete)):
+        results[name] = await measure(fn, repeat)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    regressions = []
+    for size, operations in results["sizes"].items():
+        for name, current in operations.items():
+            previous = baseline.get("sizes", {}).get(size, {}).get(name)
+            if not isinstance(current, dict) or not previous:
+                continue
+            limit = previous["median_ms"] * (1 + threshold)
+            if current["median_ms"] > limit:
+                regressions.append(
+                    f"{name} ({size} витрат): {current['median_ms']} мс проти {previous['median_ms']} мс"
+                )
+    return regressions
+
+
+async def run(args):
+    from database import Base, engine, async_engine
+    from jobs import shutdown_jobs
+    from models import User, Expense, ExpenseRollup, ExchangeRate
+
+    Base.metadata.create_all(engine, tables=[
+        User.__table__, Expense.__table__, ExpenseRollup.__table__, ExchangeRate.__table__
+    ])
+
+    # Окремі від'ємні telegram_id, щоб не перетинатися зі справжніми користувачами
+    base_id = -int(time.time())
+    results = {
+        "commit": git_commit(),
+        "dialect": engine.dialect.name,
+        "python": platform.python_version(),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+    try:
+        for index, rows in enumerate(args.rows):
+            results["sizes"][str(rows)] = await bench_size(base_id - index, rows, args.repeat)
+    finally:
+        await shutdown_jobs()
+        await async_engine.dispose()
+
+    # Звіти формуються в дочірніх процесах: їх пікова пам'ять окремо
+    results["children_max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Час і пам'ять операцій з витратами на синтетичних даних")
+    parser.add_argument("--database-url", default="sqlite:///bench.sqlite3",
+                        help="Окрема база для бенчмарку (Postgres після alembic upgrade head або SQLite)")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="JSON попереднього запуску для порівняння")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Допустиме сповільнення медіани (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    configure_database(args.database_url)
+    results = asyncio.run(run(args))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"Сповільнення: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
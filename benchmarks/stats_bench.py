@@ -0,0 +1,55 @@
+import argparse
+import json
+import sys
+import time
+from datetime import date
+
+import numpy as np
+
+from bot.config import STATS_LATENCY_BUDGET_MS
+from stats import EPOCH, compute_stats, stats_job
+
+
+def synthetic_columns(rows: int, today: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    days = today - rng.integers(0, 1500, rows)
+    uah = rng.integers(1, 5000, rows).astype(np.float64)
+    usd = uah / 41.0
+    names = np.array([f"Стаття {i}" for i in range(50)], dtype=object)[rng.integers(0, 50, rows)]
+    return days, uah, usd, names
+
+
+def timed(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {"min_ms": round(min(timings), 1), "median_ms": round(float(np.median(timings)), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Час розрахунку статистики витрат відносно бюджету")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--user-id", type=int, help="Також виміряти вибірку з бази для цього користувача")
+    args = parser.parse_args()
+
+    today = (date.today() - EPOCH).days
+    columns = synthetic_columns(args.rows, today)
+    result = {
+        "rows": args.rows,
+        "budget_ms": STATS_LATENCY_BUDGET_MS,
+        "compute": timed(lambda: compute_stats(*columns, today=today), args.repeat),
+    }
+    if args.user_id is not None:
+        result["job"] = timed(lambda: stats_job(args.user_id), args.repeat)
+
+    worst = max(part["median_ms"] for part in (result["compute"], result.get("job", result["compute"])))
+    result["within_budget"] = worst <= STATS_LATENCY_BUDGET_MS
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0 if result["within_budget"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
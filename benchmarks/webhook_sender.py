@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+
+from bot.config import WEBHOOK_PATH, WEBHOOK_SECRET, HTTP_PORT
+
+TEXTS = ("/start", "Отримати звіт витрат", "Видалити статтю витрат", "Привіт")
+
+
+def make_update(update_id: int, user_id: int, text: str):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"Load {user_id}"},
+            "text": text,
+        },
+    }
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def send_updates(url: str, secret: str, total: int, concurrency: int, users: int):
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    latencies = []
+    statuses = {}
+    queue = asyncio.Queue()
+    for update_id in range(1, total + 1):
+        queue.put_nowait(make_update(update_id, 10_000 + random.randrange(users), random.choice(TEXTS)))
+
+    async def worker(session):
+        while not queue.empty():
+            update = queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                async with session.post(url, data=json.dumps(update), headers=headers) as response:
+                    status = response.status
+            except aiohttp.ClientError as ex:
+                status = type(ex).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector, headers={"Content-Type": "application/json"}) as session:
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "updates": total,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "updates_per_s": round(total / elapsed, 1),
+        "ack_ms": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+        },
+        "statuses": {str(k): v for k, v in statuses.items()},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Надсилає синтетичні оновлення Telegram на webhook")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{HTTP_PORT}{WEBHOOK_PATH}")
+    parser.add_argument("--secret", default=WEBHOOK_SECRET)
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=500)
+    args = parser.parse_args()
+
+    result = asyncio.run(send_updates(args.url, args.secret, args.updates, args.concurrency, args.users))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -4,3 +4,109 @@ from dotenv import load_dotenv
 load_dotenv()
 
 TOKEN = os.getenv("TOKEN")
+
+# Кеш курсу долара (секунди)
+RATE_CACHE_TTL = int(os.getenv("RATE_CACHE_TTL", "600"))
+RATE_CACHE_MAX_STALE = int(os.getenv("RATE_CACHE_MAX_STALE", "86400"))
+RATE_RETRY_DELAY = int(os.getenv("RATE_RETRY_DELAY", "30"))
+
+# Джерела курсу (можна підмінити локальним сервером для тестів)
+RATE_MINFIN_URL = os.getenv("RATE_MINFIN_URL", "https://minfin.com.ua/ua/currency/usd/")
+RATE_NBU_URL = os.getenv(
+    "RATE_NBU_URL", "https://bank.gov.ua/NBUStatService/v1/statdirectory/exchange?valcode=USD&json"
+)
+RATE_PROVIDER_TIMEOUT = float(os.getenv("RATE_PROVIDER_TIMEOUT", "5"))
+RATE_BREAKER_THRESHOLD = int(os.getenv("RATE_BREAKER_THRESHOLD", "3"))
+RATE_BREAKER_RESET = int(os.getenv("RATE_BREAKER_RESET", "300"))
+RATE_NBU_HISTORY_URL = os.getenv(
+    "RATE_NBU_HISTORY_URL",
+    "https://bank.gov.ua/NBUStatService/v1/statdirectory/exchange?valcode=USD&date={date}&json"
+)
+
+# Скільки процесів бота ділять пули з'єднань і звітів (у режимі --workers задає супервізор)
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "1"))
+
+# Фонові задачі (звіти, браузер)
+REPORT_WORKERS = max(1, int(os.getenv("REPORT_WORKERS", str(min(4, os.cpu_count() or 1)))) // WORKER_PROCESSES)
+IO_WORKERS = int(os.getenv("IO_WORKERS", "4"))
+JOB_QUEUE_LIMIT = int(os.getenv("JOB_QUEUE_LIMIT", "100"))
+JOB_USER_LIMIT = int(os.getenv("JOB_USER_LIMIT", "3"))
+REPORT_TIMEOUT = float(os.getenv("REPORT_TIMEOUT", "120"))
+
+# Кеш telegram_id -> users.id
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "3600"))
+REPORT_BATCH_SIZE = int(os.getenv("REPORT_BATCH_SIZE", "2000"))
+REPORT_INLINE_MAX = int(os.getenv("REPORT_INLINE_MAX", str(5 * 1024 * 1024)))
+
+# Кеш готових звітів
+REPORT_CACHE_MAX_BYTES = int(os.getenv("REPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+REPORT_FILE_ID_CACHE_SIZE = int(os.getenv("REPORT_FILE_ID_CACHE_SIZE", "10000"))
+
+EXPENSE_PAGE_SIZE = int(os.getenv("EXPENSE_PAGE_SIZE", "10"))
+
+# Допустимі роки дат витрат: поза ними - майже напевно помилка введення
+EXPENSE_MIN_YEAR = int(os.getenv("EXPENSE_MIN_YEAR", "2000"))
+EXPENSE_MAX_YEARS_AHEAD = int(os.getenv("EXPENSE_MAX_YEARS_AHEAD", "1"))
+
+# Імпорт витрат з файлів
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+IMPORT_MAX_ROWS = int(os.getenv("IMPORT_MAX_ROWS", "200000"))
+QUICK_ENTRY_MAX_LINES = int(os.getenv("QUICK_ENTRY_MAX_LINES", "100"))
+
+# Режим отримання оновлень: polling або webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", "50"))
+WEBHOOK_MAX_PENDING = int(os.getenv("WEBHOOK_MAX_PENDING", "1000"))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+# Власний (або тестовий) Bot API сервер
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+HTTP_HOST = os.getenv("HTTP_HOST", "127.0.0.1")
+HTTP_PORT = int(os.getenv("HTTP_PORT", "8000"))
+
+# Ключ доступу до REST API (X-API-Key); без нього API вимкнене
+API_TOKEN = os.getenv("API_TOKEN", "")
+API_PAGE_LIMIT = int(os.getenv("API_PAGE_LIMIT", "500"))
+
+# Аналітика /stats
+STATS_LATENCY_BUDGET_MS = int(os.getenv("STATS_LATENCY_BUDGET_MS", "1500"))
+STATS_MONTHS = int(os.getenv("STATS_MONTHS", "6"))
+STATS_TOP_NAMES = int(os.getenv("STATS_TOP_NAMES", "5"))
+
+# Стан діалогів (FSM) у базі: незавершені діалоги видаляються через FSM_TTL секунд
+FSM_TTL = int(os.getenv("FSM_TTL", str(24 * 3600)))
+FSM_CLEANUP_INTERVAL = int(os.getenv("FSM_CLEANUP_INTERVAL", "600"))
+
+# Кілька процесів-обробників: оновлення розподіляються за telegram id користувача
+BOT_WORKERS = int(os.getenv("BOT_WORKERS", "1"))
+WORKER_QUEUE_SIZE = int(os.getenv("WORKER_QUEUE_SIZE", "1000"))
+WORKER_HEARTBEAT_INTERVAL = float(os.getenv("WORKER_HEARTBEAT_INTERVAL", "5"))
+WORKER_HEARTBEAT_TIMEOUT = float(os.getenv("WORKER_HEARTBEAT_TIMEOUT", "60"))
+WORKER_DRAIN_TIMEOUT = float(os.getenv("WORKER_DRAIN_TIMEOUT", "30"))
+# Скільки чекати місця в черзі обробника, перш ніж відкинути оновлення (polling)
+WORKER_PUT_TIMEOUT = float(os.getenv("WORKER_PUT_TIMEOUT", "5"))
+
+# Обмеження дорогих дій (звіти, статистика, імпорт): токени на користувача і загальна паралельність
+THROTTLE_RATE = float(os.getenv("THROTTLE_RATE", "0.2"))
+THROTTLE_BURST = int(os.getenv("THROTTLE_BURST", "3"))
+THROTTLE_CACHE_SIZE = int(os.getenv("THROTTLE_CACHE_SIZE", "10000"))
+EXPENSIVE_CONCURRENCY = int(os.getenv("EXPENSIVE_CONCURRENCY", "8"))
+EXPENSIVE_WAIT_TIMEOUT = float(os.getenv("EXPENSIVE_WAIT_TIMEOUT", "30"))
+
+# Повільні запити: лог з параметрами і EXPLAIN (ANALYZE, BUFFERS) для SELECT
+SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", "500"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "1") == "1"
+SLOW_QUERY_EXPLAIN_INTERVAL = int(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "300"))
+
+# Профілювання живого процесу (/profile для адміністраторів, GET /api/profile)
+ADMIN_IDS = {int(admin_id) for admin_id in os.getenv("ADMIN_IDS", "").split(",") if admin_id.strip()}
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+# Секції expenses: скільки місяців наперед створювати і як часто перевіряти
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+PARTITION_CHECK_INTERVAL = int(os.getenv("PARTITION_CHECK_INTERVAL", str(24 * 3600)))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
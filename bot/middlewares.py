@@ -0,0 +1,123 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import CallbackQuery, Message, TelegramObject
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from metrics import HANDLER_ERRORS, HANDLER_SECONDS
+
+
+class DbSessionMiddleware(BaseMiddleware):
+    def __init__(self, session_maker: async_sessionmaker):
+        self.session_maker = session_maker
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        # Сесія бере з'єднання з пулу лише при першому запиті до БД
+        async with self.session_maker() as session:
+            data["db"] = session
+            return await handler(event, data)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object is not None else "unknown"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.labels(name).inc()
+            raise
+        finally:
+            HANDLER_SECONDS.labels(name).observe(time.perf_counter() - started)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+# Обробники з flags={"expensive": True}: одна дія на користувача, token bucket і спільний семафор
+class ThrottlingMiddleware(BaseMiddleware):
+    def __init__(self, rate: float, burst: int, max_concurrent: int, wait_timeout: float, max_users: int):
+        self.rate = rate
+        self.burst = burst
+        self.wait_timeout = wait_timeout
+        self.max_users = max_users
+        self._buckets = OrderedDict()
+        self._in_flight = set()
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    def _bucket(self, user_id: int):
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+        return bucket
+
+    @staticmethod
+    async def _reply(event: TelegramObject, text: str):
+        if isinstance(event, CallbackQuery):
+            await event.answer(text)
+        elif isinstance(event, Message):
+            await event.answer(text)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if not get_flag(data, "expensive") or user is None:
+            return await handler(event, data)
+
+        if user.id in self._in_flight:
+            await self._reply(event, "Звіт уже формується, зачекайте, будь ласка.")
+            return None
+        if not self._bucket(user.id).take():
+            await self._reply(event, "Забагато запитів. Спробуйте через кілька секунд.")
+            return None
+
+        self._in_flight.add(user.id)
+        try:
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.wait_timeout)
+            except asyncio.TimeoutError:
+                await self._reply(event, "Зараз формується забагато звітів. Спробуйте, будь ласка, трохи пізніше.")
+                return None
+            try:
+                return await handler(event, data)
+            finally:
+                self._semaphore.release()
+        finally:
+            self._in_flight.discard(user.id)
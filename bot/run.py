@@ -1,20 +1,72 @@
 import asyncio
 import logging
+import os
 import re
-from aiogram import Bot, Dispatcher, types
-from aiogram.filters import CommandStart
-from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove, InputFile
+import tempfile
+from datetime import datetime, timedelta
+from aiogram import Bot, Dispatcher, F, types
+from aiogram.filters import CommandStart, Command, CommandObject
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove, InputFile, \
+    CallbackQuery, InlineKeyboardButton, BufferedInputFile
+from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-
-from bot.config import TOKEN
-from database import SessionLocal
-from parse_exchange_rate import usd_exchange_rate
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from bot.config import TOKEN, IMPORT_MAX_ROWS, QUICK_ENTRY_MAX_LINES, TELEGRAM_API_URL, WEBHOOK_URL, WEBHOOK_PATH, \
+    WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS, THROTTLE_RATE, THROTTLE_BURST, THROTTLE_CACHE_SIZE, \
+    EXPENSIVE_CONCURRENCY, EXPENSIVE_WAIT_TIMEOUT, ADMIN_IDS, PROFILE_MAX_SECONDS
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
+
+from bot.storage import DbStorage
+from bot.middlewares import DbSessionMiddleware, MetricsMiddleware, ThrottlingMiddleware
+from database import AsyncSessionLocal, async_engine, fsm_engine
+from expense_import import parse_expense_file, parse_quick_entry, to_expense_values, format_errors, \
+    is_plausible_date, ImportFileError
+from jobs import shutdown_jobs, io_jobs, QueueFull
+from rate_cache import usd_rate_cache
+from report_cache import report_cache
+from partitions import run_partition_maintenance
+from profiling import profiler
+from rate_history import usd_rate_for, usd_rates_for, load_usd_history
+from rate_providers import rate_fetcher
 from routers import create_user, post_expense, get_expenses, get_expenses_all, delete_expense, update_expense, \
-    get_expense_by_id
+    get_expense_by_id, get_expense_page, post_expenses, post_expenses_bulk, encode_cursor, decode_cursor, \
+    get_expense_stats
+from stats import format_stats
+
+
+def create_bot():
+    if TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+        return Bot(token=TOKEN, session=session)
+    return Bot(token=TOKEN)
+
+
+_bot = None
+
+
+def get_bot():
+    # Bot створюється при першому використанні, а не під час імпорту
+    global _bot
+    if _bot is None:
+        _bot = create_bot()
+    return _bot
+
 
-bot = Bot(token=TOKEN)
-dp = Dispatcher()
+storage = DbStorage(fsm_engine)
+dp = Dispatcher(storage=storage)
+dp.update.middleware(DbSessionMiddleware(AsyncSessionLocal))
+throttling = ThrottlingMiddleware(
+    THROTTLE_RATE, THROTTLE_BURST, EXPENSIVE_CONCURRENCY, EXPENSIVE_WAIT_TIMEOUT, THROTTLE_CACHE_SIZE
+)
+# Час обробника рахується разом з очікуванням у ThrottlingMiddleware
+for observer in (dp.message, dp.callback_query):
+    observer.middleware(MetricsMiddleware())
+    observer.middleware(throttling)
 
 
 class ExpenseState(StatesGroup):
@@ -26,27 +78,51 @@ class ExpenseState(StatesGroup):
     delete_id = State()
     edit_id = State()
     new_data = State()
+    import_file = State()
+    quick_entry = State()
 
 
 menu_keyboard = ReplyKeyboardMarkup(
     keyboard=[
         [KeyboardButton(text="Додати статтю витрат")],
+        [KeyboardButton(text="Швидке введення кількох витрат")],
         [KeyboardButton(text="Отримати звіт витрат")],
+        [KeyboardButton(text="Статистика витрат")],
         [KeyboardButton(text="Видалити статтю витрат")],
-        [KeyboardButton(text="Відредагувати статтю витрат")]
+        [KeyboardButton(text="Відредагувати статтю витрат")],
+        [KeyboardButton(text="Завантажити всі витрати (XLSX)")],
+        [KeyboardButton(text="Імпортувати витрати з файлу")]
     ],
     resize_keyboard=True
 )
 
 
+class ExpensePage(CallbackData, prefix="page"):
+    mode: str
+    direction: str
+    cursor: str = ""
+    month: str = ""
+
+
+class ExpenseAction(CallbackData, prefix="expense"):
+    mode: str
+    expense_id: int
+    # Дата витрати (YYYYmmdd): пошук за id іде лише в її секції
+    day: str = ""
+
+
+PAGE_TITLES = {
+    "delete": "Оберіть статтю витрат, яку потрібно видалити (або введіть її ID):",
+    "edit": "Оберіть статтю витрат, яку потрібно відредагувати (або введіть її ID):",
+}
+
+
 @dp.message(CommandStart())
-async def cmd_start(message: Message):
+async def cmd_start(message: Message, db: AsyncSession):
     telegram_id = message.from_user.id
     username = message.from_user.username
 
-    db = SessionLocal()
-    user = create_user(db, telegram_id, username)
-    db.close()
+    user = await create_user(db, telegram_id, username)
 
     await message.answer(f"Привіт, {user.username}!\nОберіть дію:", reply_markup=menu_keyboard)
 
@@ -77,7 +153,7 @@ async def expense_date(message: Message, state: FSMContext):
 
 
 @dp.message(ExpenseState.amount)
-async def expense_amount(message: Message, state: FSMContext):
+async def expense_amount(message: Message, state: FSMContext, db: AsyncSession):
     amount_str = message.text
     if not amount_str.replace('.', '', 1).isdigit():  # Проверка, что сумма это число
         await message.answer("Сума витрат повинна бути числом! Будь ласка, введіть коректну суму.")
@@ -91,7 +167,7 @@ async def expense_amount(message: Message, state: FSMContext):
     expense_date = data['date']
     expense_amount = float(data['amount'])
 
-    usd_rate = usd_exchange_rate()
+    usd_rate = await usd_rate_for(parse_date(expense_date))
 
     if usd_rate:
         expense_amount_usd = round(expense_amount / usd_rate, 2)
@@ -116,17 +192,82 @@ async def expense_amount(message: Message, state: FSMContext):
             f"Не вдалося отримати курс долара"
         )
 
-    db = SessionLocal()
-    post_expense(db, message.from_user.id, data)
-    db.close()
+    result = await post_expense(db, message.from_user.id, data)
+    if isinstance(result, str):
+        response_text = f"Не вдалося додати витрату: {result}"
 
     await state.clear()
     await message.answer(response_text, reply_markup=menu_keyboard)
     await message.answer("Оберіть дію:", reply_markup=menu_keyboard)
 
 
+@dp.message(lambda message: message.text == "Швидке введення кількох витрат")
+async def quick_entry_request(message: Message, state: FSMContext):
+    await message.answer(
+        "Надішліть витрати одним повідомленням, кожну з нового рядка у форматі 'dd.mm.YYYY Назва Сума', "
+        "наприклад:\n19.03.2025 Продукти 550\n19.03.2025 Таксі 180",
+        reply_markup=ReplyKeyboardRemove()
+    )
+    await state.set_state(ExpenseState.quick_entry)
+
+
+@dp.message(ExpenseState.quick_entry, F.text)
+async def quick_entry(message: Message, state: FSMContext, db: AsyncSession):
+    rows, errors = parse_quick_entry(message.text, QUICK_ENTRY_MAX_LINES)
+
+    if errors or not rows:
+        await message.answer(
+            "Жодну витрату не додано, виправте рядки та надішліть повідомлення ще раз:\n\n"
+            + (format_errors(errors) if errors else "Повідомлення порожнє")
+        )
+        return
+
+    rates = await usd_rates_for(row[0].date() for row in rows)
+    expenses = to_expense_values(rows, rates)
+    added = await post_expenses(db, message.from_user.id, expenses)
+
+    await state.clear()
+    if isinstance(added, str):
+        await message.answer(added, reply_markup=menu_keyboard)
+        return
+    added = len(added)
+
+    total_uah = sum(expense["uah"] for expense in expenses)
+    total_usd = sum(expense["usd"] for expense in expenses if expense["usd"] is not None)
+    await message.answer(
+        f"Додано статей витрат: {added}\n"
+        f"Загальна сума: {total_uah:g} грн\n"
+        f"Загальна сума в доларах: {round(total_usd, 2)} USD",
+        reply_markup=menu_keyboard
+    )
+
+
 def is_valid_date(date_str):
-    return bool(re.match(r"\d{2}\.\d{2}\.\d{4}", date_str))
+    if not re.match(r"\d{2}\.\d{2}\.\d{4}", date_str):
+        return False
+    try:
+        return is_plausible_date(parse_date(date_str))
+    except ValueError:
+        return False
+
+
+def parse_date(date_str):
+    return datetime.strptime(date_str, "%d.%m.%Y").date()
+
+
+def parse_day(day: str):
+    return datetime.strptime(day, "%Y%m%d") if day else None
+
+
+async def send_report(message: Message, report_file):
+    try:
+        sent = await message.answer_document(report_file.as_input_file("expense_report.xlsx"))
+    finally:
+        report_file.discard()
+
+    # Незмінений звіт наступного разу надсилається за file_id без повторного завантаження
+    if report_file.key is not None and sent.document is not None:
+        report_cache.set_file_id(report_file.key, sent.document.file_id)
 
 
 @dp.message(lambda message: message.text == "Отримати звіт витрат")
@@ -150,8 +291,8 @@ async def start_date(message: Message, state: FSMContext):
     await state.set_state(ExpenseState.end_date)
 
 
-@dp.message(ExpenseState.end_date)
-async def end_date(message: types.Message, state: FSMContext):
+@dp.message(ExpenseState.end_date, flags={"expensive": True})
+async def end_date(message: types.Message, state: FSMContext, db: AsyncSession):
     date_str = message.text
     if not is_valid_date(date_str):
         await message.answer("Невірний формат дати! Використовуйте формат dd.mm.YYYY.")
@@ -163,44 +304,254 @@ async def end_date(message: types.Message, state: FSMContext):
     start_date = data.get('start_date')
     end_date = data.get('end_date')
 
-    db = SessionLocal()
-    report_file = get_expenses(db, message.from_user.id, start_date, end_date)
-    db.close()
+    report_file = await get_expenses(db, message.from_user.id, start_date, end_date)
 
     if isinstance(report_file, str):
         await message.answer(report_file)
         await state.clear()
         await message.answer("Оберіть дію:", reply_markup=menu_keyboard)
     else:
-        report_file.seek(0)
-        await message.answer_document(types.BufferedInputFile(report_file.read(), filename="expense_report.xlsx"))
+        await send_report(message, report_file)
         await message.answer("Звіт витрат за вказаний період:", reply_markup=menu_keyboard)
         await message.answer("Оберіть дію:", reply_markup=menu_keyboard)
         await state.clear()
 
 
-@dp.message(lambda message: message.text == "Видалити статтю витрат")
-async def delete_expense_request(message: Message, state: FSMContext):
-    await message.answer("Генеруємо список витрат...", reply_markup=ReplyKeyboardRemove())
+@dp.message(lambda message: message.text == "Завантажити всі витрати (XLSX)", flags={"expensive": True})
+async def export_all_expenses(message: Message, db: AsyncSession):
+    await message.answer("Генеруємо список витрат...")
 
-    db = SessionLocal()
-    report_file = get_expenses_all(db, message.from_user.id)
-    db.close()
+    report_file = await get_expenses_all(db, message.from_user.id)
 
     if isinstance(report_file, str):
         await message.answer(report_file)
     else:
-        report_file.seek(0)
-        await message.answer_document(
-            types.BufferedInputFile(report_file.read(), filename="expense_report.xlsx")
+        await send_report(message, report_file)
+    await message.answer("Оберіть дію:", reply_markup=menu_keyboard)
+
+
+@dp.message(lambda message: message.text == "Імпортувати витрати з файлу")
+async def import_expenses_request(message: Message, state: FSMContext):
+    await message.answer(
+        "Надішліть файл CSV або XLSX з колонками 'Назва', 'Дата' (dd.mm.YYYY) та 'Сума (грн)'.\n"
+        "Без заголовка очікується порядок: дата, назва, сума.",
+        reply_markup=ReplyKeyboardRemove()
+    )
+    await state.set_state(ExpenseState.import_file)
+
+
+@dp.message(ExpenseState.import_file, F.document, flags={"expensive": True})
+async def import_expenses_file(message: Message, state: FSMContext, db: AsyncSession):
+    filename = message.document.file_name or ""
+    if not filename.lower().endswith((".csv", ".xlsx")):
+        await message.answer("Підтримуються лише файли .csv та .xlsx. Надішліть інший файл:")
+        return
+
+    await message.answer("Імпортуємо витрати...")
+    try:
+        response_text = await import_file(message, db, filename)
+    finally:
+        await state.clear()
+    await message.answer(response_text, reply_markup=menu_keyboard)
+
+
+async def import_file(message: Message, db: AsyncSession, filename: str):
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(filename)[1])
+    os.close(fd)
+    try:
+        await message.bot.download(message.document, destination=path)
+        rows, errors = await io_jobs.submit(message.from_user.id, parse_expense_file, path, filename, IMPORT_MAX_ROWS)
+    except QueueFull:
+        return "Зараз імпортується забагато файлів. Спробуйте, будь ласка, трохи пізніше."
+    except ImportFileError as e:
+        return f"Не вдалося прочитати файл: {e}."
+    finally:
+        os.remove(path)
+
+    rates = await usd_rates_for(row[0].date() for row in rows)
+    try:
+        imported = await post_expenses_bulk(db, message.from_user.id, to_expense_values(rows, rates))
+    except IntegrityError:
+        await db.rollback()
+        return "Не вдалося зберегти витрати з файлу. Спробуйте ще раз."
+    if isinstance(imported, str):
+        return imported
+
+    response_text = f"Імпортовано статей витрат: {imported}"
+    if errors:
+        response_text += f"\nПропущено рядків з помилками: {len(errors)}\n\n{format_errors(errors)}"
+    return response_text
+
+
+@dp.message(ExpenseState.import_file)
+async def import_expenses_no_file(message: Message):
+    await message.answer("Очікується файл CSV або XLSX. Надішліть файл як документ:")
+
+
+def next_month(day: datetime):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+async def build_expense_page(db: AsyncSession, telegram_id: int, mode: str, direction: str = "first",
+                             cursor: str = "", month: str = ""):
+    cursor_key = decode_cursor(cursor) if cursor else None
+    month_end = next_month(datetime.strptime(month, "%Y%m")) if month else None
+
+    rows, has_older, has_newer = await get_expense_page(db, telegram_id, direction, cursor_key, month_end)
+    if not rows and direction != "first":
+        rows, has_older, has_newer = await get_expense_page(db, telegram_id)
+    if not rows:
+        return None
+
+    builder = InlineKeyboardBuilder()
+    for row in rows:
+        builder.row(InlineKeyboardButton(
+            text=f"{row.date:%d.%m.%Y} · {row.name[:30]} · {row.uah:g} грн",
+            callback_data=ExpenseAction(mode=mode, expense_id=row.id, day=f"{row.date:%Y%m%d}").pack()
+        ))
+
+    navigation = []
+    if has_newer:
+        navigation.append(InlineKeyboardButton(
+            text="⬅️ Новіші",
+            callback_data=ExpensePage(mode=mode, direction="newer", cursor=encode_cursor(rows[0])).pack()
+        ))
+    if has_older:
+        navigation.append(InlineKeyboardButton(
+            text="Старіші ➡️",
+            callback_data=ExpensePage(mode=mode, direction="older", cursor=encode_cursor(rows[-1])).pack()
+        ))
+    if navigation:
+        builder.row(*navigation)
+
+    # Перехід по місяцях відносно найновішої витрати на сторінці
+    shown_month = rows[0].date.replace(day=1)
+    previous_month = (shown_month - timedelta(days=1)).replace(day=1)
+    months = [InlineKeyboardButton(
+        text=f"« {previous_month:%m.%Y}",
+        callback_data=ExpensePage(mode=mode, direction="month", month=f"{previous_month:%Y%m}").pack()
+    )]
+    following_month = next_month(shown_month)
+    if following_month <= datetime.now():
+        months.append(InlineKeyboardButton(
+            text=f"{following_month:%m.%Y} »",
+            callback_data=ExpensePage(mode=mode, direction="month", month=f"{following_month:%Y%m}").pack()
+        ))
+    builder.row(*months)
+
+    return builder.as_markup()
+
+
+async def open_expense_browser(message: Message, state: FSMContext, db: AsyncSession, mode: str, next_state):
+    keyboard = await build_expense_page(db, message.from_user.id, mode)
+
+    if keyboard is None:
+        await message.answer("У вас поки немає витрат.", reply_markup=menu_keyboard)
+        return
+
+    await message.answer("Завантажуємо витрати...", reply_markup=ReplyKeyboardRemove())
+    await message.answer(PAGE_TITLES[mode], reply_markup=keyboard)
+    await state.set_state(next_state)
+
+
+@dp.message(Command("stats"), flags={"expensive": True})
+@dp.message(lambda message: message.text == "Статистика витрат", flags={"expensive": True})
+async def expense_stats(message: Message, db: AsyncSession):
+    stats = await get_expense_stats(db, message.from_user.id)
+
+    if isinstance(stats, str):
+        await message.answer(stats, reply_markup=menu_keyboard)
+    else:
+        await message.answer(format_stats(stats), reply_markup=menu_keyboard)
+
+
+@dp.message(Command("profile"), F.from_user.id.in_(ADMIN_IDS))
+async def profile_process(message: Message, command: CommandObject):
+    # /profile 10 - профіль цього процесу бота за 10 секунд у collapsed-форматі (flamegraph)
+    seconds = int(command.args) if command.args and command.args.isdigit() else 10
+    seconds = min(max(seconds, 1), PROFILE_MAX_SECONDS)
+    if profiler.running:
+        await message.answer("Профілювання вже виконується.")
+        return
+
+    await message.answer(f"Профілюємо процес {seconds} с...")
+    try:
+        stacks = await asyncio.to_thread(profiler.run, seconds)
+    except RuntimeError as e:
+        await message.answer(str(e))
+        return
+    await message.answer_document(BufferedInputFile(stacks.encode(), filename=f"profile-{os.getpid()}.collapsed"))
+
+
+@dp.message(lambda message: message.text == "Видалити статтю витрат", flags={"expensive": True})
+async def delete_expense_request(message: Message, state: FSMContext, db: AsyncSession):
+    await open_expense_browser(message, state, db, "delete", ExpenseState.delete_id)
+
+
+@dp.callback_query(ExpensePage.filter())
+async def expense_page(callback: CallbackQuery, callback_data: ExpensePage, db: AsyncSession):
+    keyboard = await build_expense_page(
+        db, callback.from_user.id, callback_data.mode, callback_data.direction, callback_data.cursor,
+        callback_data.month
+    )
+
+    if keyboard is None:
+        await callback.message.edit_text("У вас поки немає витрат.")
+    else:
+        await callback.message.edit_text(PAGE_TITLES[callback_data.mode], reply_markup=keyboard)
+    await callback.answer()
+
+
+@dp.callback_query(ExpenseAction.filter(F.mode == "delete"))
+async def delete_expense_ask(callback: CallbackQuery, callback_data: ExpenseAction, db: AsyncSession):
+    expense = await get_expense_by_id(
+        db, callback.from_user.id, callback_data.expense_id, parse_day(callback_data.day)
+    )
+
+    if not isinstance(expense, dict):
+        await callback.answer("Витрата не знайдена", show_alert=True)
+        return
+
+    builder = InlineKeyboardBuilder()
+    builder.row(
+        InlineKeyboardButton(
+            text="Так, видалити",
+            callback_data=ExpenseAction(mode="confirm", expense_id=callback_data.expense_id, day=callback_data.day).pack()
+        ),
+        InlineKeyboardButton(
+            text="Назад",
+            callback_data=ExpensePage(mode="delete", direction="first").pack()
         )
-        await message.answer("Введіть ID статті витрат, яку потрібно видалити:")
+    )
+    await callback.message.edit_text(
+        f"Видалити статтю витрат?\n\n"
+        f"Назва: {expense.get('Назва')}\n"
+        f"Дата: {expense.get('Дата')}\n"
+        f"Сума: {expense.get('Сума (грн)')} грн",
+        reply_markup=builder.as_markup()
+    )
+    await callback.answer()
 
-        await state.set_state(ExpenseState.delete_id)
+
+@dp.callback_query(ExpenseAction.filter(F.mode == "confirm"))
+async def delete_expense_callback(callback: CallbackQuery, callback_data: ExpenseAction, state: FSMContext,
+                                  db: AsyncSession):
+    delete_status = await delete_expense(
+        db, callback.from_user.id, callback_data.expense_id, parse_day(callback_data.day)
+    )
+
+    if delete_status:
+        await callback.message.edit_text("Стаття витрат успішно видалена.")
+    else:
+        await callback.message.edit_text("Не вдалося знайти статтю витрат. Можливо, її вже видалено.")
+    await callback.answer()
+
+    await state.clear()
+    await callback.message.answer("Оберіть дію:", reply_markup=menu_keyboard)
 
 
 @dp.message(ExpenseState.delete_id)
-async def delete_expense_confirm(message: Message, state: FSMContext):
+async def delete_expense_confirm(message: Message, state: FSMContext, db: AsyncSession):
     expense_id = message.text.strip()
 
     if not expense_id.isdigit():
@@ -209,9 +560,7 @@ async def delete_expense_confirm(message: Message, state: FSMContext):
 
     expense_id = int(expense_id)
 
-    db = SessionLocal()
-    delete_status = delete_expense(db, message.from_user.id, expense_id)
-    db.close()
+    delete_status = await delete_expense(db, message.from_user.id, expense_id)
 
     if delete_status:
         await message.answer(f"Стаття витрат з ID {expense_id} успішно видалена.")
@@ -222,70 +571,58 @@ async def delete_expense_confirm(message: Message, state: FSMContext):
     await message.answer("Оберіть дію:", reply_markup=menu_keyboard)
 
 
-@dp.message(lambda message: message.text == "Відредагувати статтю витрат")
-async def edit_expense_request(message: Message, state: FSMContext):
-    await message.answer("Генеруємо список витрат...", reply_markup=ReplyKeyboardRemove())
+@dp.message(lambda message: message.text == "Відредагувати статтю витрат", flags={"expensive": True})
+async def edit_expense_request(message: Message, state: FSMContext, db: AsyncSession):
+    await open_expense_browser(message, state, db, "edit", ExpenseState.edit_id)
 
-    db = SessionLocal()
-    report_file = get_expenses_all(db, message.from_user.id)
-    db.close()
 
-    if isinstance(report_file, str):
-        await message.answer(report_file)
-    else:
-        report_file.seek(0)
-        await message.answer_document(
-            types.BufferedInputFile(report_file.read(), filename="expense_report.xlsx")
-        )
-        await message.answer("Введіть ID статті витрат, яку потрібно відредагувати:")
-
-        await state.set_state(ExpenseState.edit_id)
+async def ask_new_expense_data(message: Message, state: FSMContext, expense_id: int, expense: dict):
+    await state.update_data(expense_id=expense_id, expense_date=expense.get('Дата'))
+    await message.answer(
+        f"Поточна стаття витрат:\n\n"
+        f"Назва: {expense.get('Назва')}\n"
+        f"Сума: {expense.get('Сума (грн)')}\n"
 
+        "Введіть нову назву та нову суму через кому (наприклад: Продукти, 5500):"
+    )
+    await state.set_state(ExpenseState.new_data)
 
-@dp.message(lambda message: message.text == "Відредагувати статтю витрат")
-async def edit_expense_request(message: types.Message, state: FSMContext):
-    await message.answer("Генеруємо список витрат...", reply_markup=ReplyKeyboardRemove())
 
-    db = SessionLocal()
-    report_file = get_expenses_all(db, message.from_user.id)
-    db.close()
+@dp.callback_query(ExpenseAction.filter(F.mode == "edit"))
+async def edit_expense_callback(callback: CallbackQuery, callback_data: ExpenseAction, state: FSMContext,
+                                db: AsyncSession):
+    expense = await get_expense_by_id(
+        db, callback.from_user.id, callback_data.expense_id, parse_day(callback_data.day)
+    )
 
-    if isinstance(report_file, str):
-        await message.answer(report_file)
-    else:
-        report_file.seek(0)
-        await message.answer_document(
-            types.BufferedInputFile(report_file.read(), filename="expense_report.xlsx")
-        )
-        await message.answer("Введіть ID статті витрат, яку потрібно відредагувати:")
+    if not isinstance(expense, dict):
+        await callback.answer("Витрата не знайдена", show_alert=True)
+        return
 
-        await state.set_state(ExpenseState.edit_id)
+    await callback.answer()
+    await ask_new_expense_data(callback.message, state, callback_data.expense_id, expense)
 
 
 @dp.message(ExpenseState.edit_id)
-async def get_expense_id(message: types.Message, state: FSMContext):
+async def get_expense_id(message: types.Message, state: FSMContext, db: AsyncSession):
     expense_id = message.text.strip()
 
-    db = SessionLocal()
-    expense = get_expense_by_id(db, message.from_user.id, expense_id)
-    db.close()
+    if not expense_id.isdigit():
+        await message.answer("ID має бути числом! Введіть коректний ID статті витрат:")
+        return
 
-    if expense:
-        await state.update_data(expense_id=expense_id)
-        await message.answer(
-            f"Поточна стаття витрат:\n\n"
-            f"Назва: {expense.get('Назва')}\n"
-            f"Сума: {expense.get('Сума (грн)')}\n"
+    expense_id = int(expense_id)
 
-            "Введіть нову назву та нову суму через кому (наприклад: Продукти, 5500):"
-        )
-        await state.set_state(ExpenseState.new_data)
+    expense = await get_expense_by_id(db, message.from_user.id, expense_id)
+
+    if isinstance(expense, dict):
+        await ask_new_expense_data(message, state, expense_id, expense)
     else:
         await message.answer("Витрата з таким ID не знайдена. Спробуйте ще раз.")
 
 
 @dp.message(ExpenseState.new_data)
-async def update_expense_data(message: types.Message, state: FSMContext):
+async def update_expense_data(message: types.Message, state: FSMContext, db: AsyncSession):
     try:
         new_data = message.text.strip().split(",")
         if len(new_data) != 2:
@@ -304,11 +641,14 @@ async def update_expense_data(message: types.Message, state: FSMContext):
     data = await state.get_data()
     expense_id = data["expense_id"]
 
-    db = SessionLocal()
-    success = update_expense(db, message.from_user.id, expense_id, new_name, new_amount)
-    db.close()
+    expense_date = parse_date(data["expense_date"])
+    usd_rate = await usd_rate_for(expense_date)
 
-    if success:
+    result = await update_expense(
+        db, message.from_user.id, expense_id, new_name, new_amount, usd_rate, expense_date
+    )
+
+    if result == "Витрата успішно оновлена":
         await message.answer(
             f"Стаття витрат успішно оновлена:\n\n"
             f"Нова назва: {new_name}\n"
@@ -322,9 +662,52 @@ async def update_expense_data(message: types.Message, state: FSMContext):
     await message.answer("Оберіть дію:", reply_markup=menu_keyboard)
 
 
+async def on_startup(maintenance: bool = True):
+    await asyncio.to_thread(load_usd_history)
+    background = [asyncio.create_task(usd_rate_cache.run_refresher())]
+    # Обслуговування бази одне на всі процеси: у режимі --workers його виконує супервізор
+    if maintenance:
+        background += [
+            asyncio.create_task(storage.run_cleanup()),
+            asyncio.create_task(run_partition_maintenance(async_engine)),
+        ]
+    return background
+
+
+async def on_shutdown(background):
+    for task in background:
+        task.cancel()
+    await rate_fetcher.close()
+    await shutdown_jobs()
+    await async_engine.dispose()
+    await fsm_engine.dispose()
+
+
 async def start_bot():
     logging.info("Telegram Bot працює")
-    await dp.start_polling(bot)
+    background = await on_startup()
+    try:
+        await dp.start_polling(get_bot())
+    finally:
+        await on_shutdown(background)
+
+
+async def start_webhook(processor):
+    logging.info("Telegram Bot працює через webhook")
+    background = await on_startup()
+    try:
+        await get_bot().set_webhook(
+            WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET or None,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+        # Оновлення приходять через FastAPI, тут лише чекаємо на зупинку
+        await asyncio.Event().wait()
+    finally:
+        await processor.drain()
+        await on_shutdown(background)
+        await get_bot().session.close()
 
 
 async def main():
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from sqlalchemy import and_, case, delete, or_, select
+from sqlalchemy.dialects.postgresql import insert
+
+from bot.config import FSM_TTL, FSM_CLEANUP_INTERVAL
+from models import FsmState
+
+# Рядок, прочитаний get_state: get_data того ж оновлення (та сама задача) бере дані з нього
+fetched_row = ContextVar("fetched_fsm_row", default=None)
+
+
+# FSM у Postgres, спільний для всіх процесів; прострочений рядок вважається порожнім
+class DbStorage(BaseStorage):
+    def __init__(self, engine, ttl: int = FSM_TTL, key_builder: Optional[KeyBuilder] = None):
+        self.engine = engine
+        # Кожна операція - один запит, тож без BEGIN/COMMIT навколо нього
+        self.autocommit_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+        self.ttl = timedelta(seconds=ttl)
+        self.key_builder = key_builder or DefaultKeyBuilder(with_destiny=True)
+
+    def _key(self, key: StorageKey):
+        return self.key_builder.build(key)
+
+    async def _execute(self, stmt):
+        async with self.autocommit_engine.connect() as conn:
+            result = await conn.execute(stmt)
+            return result.first() if result.returns_rows else None
+
+    async def _write(self, stmt):
+        fetched_row.set(None)
+        return await self._execute(stmt)
+
+    def _upsert(self, key: StorageKey, now: datetime, **values):
+        stmt = insert(FsmState).values(key=self._key(key), expires_at=now + self.ttl, **values)
+        alive = FsmState.expires_at > now
+        # Значення з простроченого діалогу не переносяться в новий
+        set_ = {
+            "state": case((alive, FsmState.state), else_=None),
+            "data": case((alive, FsmState.data), else_=None),
+            "expires_at": stmt.excluded.expires_at,
+        }
+        for column in values:
+            set_[column] = getattr(stmt.excluded, column)
+        return stmt, set_, alive
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        stmt, set_, _ = self._upsert(key, datetime.utcnow(), state=state)
+        await self._write(stmt.on_conflict_do_update(index_elements=[FsmState.key], set_=set_))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        # Стан і дані одним запитом: після фільтра стану обробник зазвичай читає дані
+        storage_key = self._key(key)
+        row = await self._execute(
+            select(FsmState.state, FsmState.data)
+            .where(FsmState.key == storage_key, FsmState.expires_at > datetime.utcnow())
+        )
+        fetched_row.set((storage_key, row))
+        return row.state if row else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        stmt, set_, _ = self._upsert(key, datetime.utcnow(), data=dict(data) or None)
+        await self._write(stmt.on_conflict_do_update(index_elements=[FsmState.key], set_=set_))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        storage_key = self._key(key)
+        fetched = fetched_row.get()
+        if fetched is not None and fetched[0] == storage_key:
+            row = fetched[1]
+        else:
+            row = await self._execute(
+                select(FsmState.data).where(FsmState.key == storage_key, FsmState.expires_at > datetime.utcnow())
+            )
+        return dict(row.data) if row and row.data else {}
+
+    async def update_data(self, key: StorageKey, data: Mapping[str, Any]) -> Dict[str, Any]:
+        # Злиття в самій базі (jsonb ||): один запит замість читання і запису
+        stmt, set_, alive = self._upsert(key, datetime.utcnow(), data=dict(data))
+        set_["data"] = case(
+            (and_(alive, FsmState.data.isnot(None)), FsmState.data.op("||")(stmt.excluded.data)),
+            else_=stmt.excluded.data
+        )
+        row = await self._write(
+            stmt.on_conflict_do_update(index_elements=[FsmState.key], set_=set_).returning(FsmState.data)
+        )
+        return dict(row.data) if row and row.data else {}
+
+    async def close(self) -> None:
+        pass
+
+    async def cleanup(self):
+        async with self.autocommit_engine.connect() as conn:
+            result = await conn.execute(delete(FsmState).where(or_(
+                FsmState.expires_at <= datetime.utcnow(),
+                and_(FsmState.state.is_(None), FsmState.data.is_(None))
+            )))
+            return result.rowcount
+
+    async def run_cleanup(self, interval: int = FSM_CLEANUP_INTERVAL):
+        while True:
+            try:
+                removed = await self.cleanup()
+                if removed:
+                    logging.info(f"Видалено {removed} завершених або покинутих діалогів")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"Не вдалося прибрати старі діалоги: {e}")
+            await asyncio.sleep(interval)
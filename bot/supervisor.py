@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import time
+
+from aiogram.types import Update
+
+from bot.config import BOT_WORKERS, WORKER_QUEUE_SIZE, WORKER_HEARTBEAT_INTERVAL, WORKER_HEARTBEAT_TIMEOUT, \
+    WORKER_DRAIN_TIMEOUT, WORKER_PUT_TIMEOUT, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS
+from bot.webhook import shard_key
+
+STOP = None
+BATCH_SIZE = 100
+
+
+def take_batch(updates, room: int):
+    # Блокуюче читання з черги виконується в окремому потоці, щоб не зупиняти цикл подій
+    try:
+        batch = [updates.get(timeout=1)]
+    except queue.Empty:
+        return []
+    while len(batch) < room and batch[-1] is not STOP:
+        try:
+            batch.append(updates.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+async def beat(heartbeat):
+    while True:
+        heartbeat.value = time.time()
+        await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+
+
+async def run_worker(updates, heartbeat):
+    from bot.run import get_bot, dp, on_startup, on_shutdown
+    from bot.webhook import create_processor
+
+    bot = get_bot()
+    processor = create_processor(dp, bot)
+    background = await on_startup(maintenance=False)
+    background.append(asyncio.create_task(beat(heartbeat)))
+    try:
+        while True:
+            room = min(processor.max_pending - processor.pending, BATCH_SIZE)
+            if room <= 0:
+                await asyncio.sleep(0.01)
+                continue
+
+            batch = await asyncio.to_thread(take_batch, updates, room)
+            for payload in batch:
+                if payload is STOP:
+                    return
+                processor.submit_json(payload)
+    finally:
+        await processor.drain(WORKER_DRAIN_TIMEOUT)
+        await on_shutdown(background)
+        await bot.session.close()
+
+
+def worker_main(index: int, updates, heartbeat):
+    logging.basicConfig(level=logging.INFO, format=f"[worker {index}] %(levelname)s:%(name)s:%(message)s")
+    try:
+        asyncio.run(run_worker(updates, heartbeat))
+    except KeyboardInterrupt:
+        # Зупинку робить супервізор через STOP у черзі
+        pass
+
+
+class Worker:
+    def __init__(self, index: int, ctx):
+        self.index = index
+        self.ctx = ctx
+        self.updates = ctx.Queue(WORKER_QUEUE_SIZE)
+        self.heartbeat = ctx.Value("d", 0.0, lock=False)
+        self.process = None
+        self.restarts = 0
+
+    def start(self):
+        # Запас часу на імпорти і завантаження курсів при старті
+        self.heartbeat.value = time.time() + WORKER_HEARTBEAT_TIMEOUT
+        self.process = self.ctx.Process(
+            target=worker_main, args=(self.index, self.updates, self.heartbeat), name=f"bot-worker-{self.index}"
+        )
+        self.process.start()
+
+    def check(self):
+        if not self.process.is_alive():
+            logging.error(f"Обробник {self.index} завершився з кодом {self.process.exitcode}, перезапуск")
+        elif time.time() - self.heartbeat.value > WORKER_HEARTBEAT_TIMEOUT:
+            logging.error(f"Обробник {self.index} не відповідає {WORKER_HEARTBEAT_TIMEOUT:g} с, перезапуск")
+            self.process.kill()
+            self.process.join()
+        else:
+            return
+        self.restarts += 1
+        self.replace_queue()
+        self.start()
+
+    def replace_queue(self):
+        # Процес, убитий посеред get(), не відпускає внутрішній замок черги: новий обробник не прочитав би нічого
+        lost = self.updates.qsize()
+        if lost:
+            logging.error(f"Обробник {self.index}: втрачено {lost} оновлень зі старої черги")
+        self.updates.cancel_join_thread()
+        self.updates.close()
+        self.updates = self.ctx.Queue(WORKER_QUEUE_SIZE)
+
+
+# Оновлення одного користувача завжди йдуть в один процес і обробляються по черзі
+class Supervisor:
+    def __init__(self, workers: int = BOT_WORKERS):
+        self.ctx = multiprocessing.get_context("spawn")
+        self.workers = [Worker(index, self.ctx) for index in range(workers)]
+        self.accepting = False
+
+    def start(self):
+        # Пули з'єднань і звітів діляться між обробниками (змінна успадковується дочірніми процесами)
+        os.environ["WORKER_PROCESSES"] = str(len(self.workers))
+        for worker in self.workers:
+            worker.start()
+        self.accepting = True
+
+    def route(self, payload: dict):
+        return self.workers[shard_key(payload) % len(self.workers)]
+
+    def submit_json(self, payload: dict):
+        # Перевірка до черги: некоректне оновлення не має дійти до процесу-обробника
+        Update.model_validate(payload)
+        return self.enqueue(payload)
+
+    def enqueue(self, payload: dict):
+        if not self.accepting:
+            return False
+        try:
+            self.route(payload).updates.put_nowait(payload)
+        except queue.Full:
+            return False
+        return True
+
+    async def put(self, payload: dict, timeout: float = WORKER_PUT_TIMEOUT):
+        # Оновлення з get_updates уже розібрані aiogram. Переповнена черга одного обробника
+        # не має зупиняти get_updates для всіх: після timeout оновлення відкидається
+        deadline = time.monotonic() + timeout
+        while not self.enqueue(payload):
+            if time.monotonic() >= deadline:
+                logging.error(
+                    f"Обробник {self.route(payload).index} не встигає, оновлення {payload.get('update_id')} відкинуто"
+                )
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    async def monitor(self):
+        while True:
+            await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+            for worker in self.workers:
+                worker.check()
+
+    async def drain(self, timeout: float = WORKER_DRAIN_TIMEOUT):
+        self.accepting = False
+        for worker in self.workers:
+            await asyncio.to_thread(worker.updates.put, STOP)
+        for worker in self.workers:
+            await asyncio.to_thread(worker.process.join, timeout)
+            if worker.process.is_alive():
+                logging.warning(f"Обробник {worker.index} не завершився за {timeout:g} с, зупиняємо примусово")
+                worker.process.terminate()
+
+
+async def run_supervised_polling(supervisor: Supervisor):
+    from bot.run import get_bot, dp, on_startup, on_shutdown
+
+    bot = get_bot()
+    logging.info(f"Telegram Bot працює: {len(supervisor.workers)} процесів-обробників")
+    # Курси для API і обслуговування бази - у процесі супервізора, один раз
+    background = await on_startup()
+    monitor = asyncio.create_task(supervisor.monitor())
+    offset = None
+    try:
+        allowed_updates = dp.resolve_used_update_types()
+        while True:
+            try:
+                updates = await bot.get_updates(offset=offset, timeout=30, allowed_updates=allowed_updates)
+            except Exception as e:
+                logging.warning(f"Не вдалося отримати оновлення: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            for update in updates:
+                await supervisor.put(update.model_dump(mode="json", exclude_none=True, by_alias=True))
+                offset = update.update_id + 1
+    finally:
+        monitor.cancel()
+        await supervisor.drain()
+        await on_shutdown(background)
+        await bot.session.close()
+
+
+async def run_supervised_webhook(supervisor: Supervisor):
+    from bot.run import get_bot, dp, on_startup, on_shutdown
+
+    bot = get_bot()
+    logging.info(f"Telegram Bot працює через webhook: {len(supervisor.workers)} процесів-обробників")
+    background = await on_startup()
+    monitor = asyncio.create_task(supervisor.monitor())
+    try:
+        await bot.set_webhook(
+            WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET or None,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+        await asyncio.Event().wait()
+    finally:
+        monitor.cancel()
+        await supervisor.drain()
+        await on_shutdown(background)
+        await bot.session.close()
@@ -0,0 +1,102 @@
+import asyncio
+import hmac
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from pydantic import ValidationError
+
+from bot.config import WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_CONCURRENCY, WEBHOOK_MAX_PENDING
+
+
+def shard_key(payload: dict):
+    # Користувач (from/user) з першого вкладеного об'єкта оновлення, інакше чат
+    for value in payload.values():
+        if isinstance(value, dict):
+            user = value.get("from") or value.get("user")
+            if isinstance(user, dict) and "id" in user:
+                return user["id"]
+            chat = value.get("chat") or (value.get("message") or {}).get("chat")
+            if isinstance(chat, dict) and "id" in chat:
+                return chat["id"]
+    return payload.get("update_id", 0)
+
+
+class UpdateProcessor:
+    def __init__(self, dp: Dispatcher, bot: Bot, concurrency: int, max_pending: int):
+        self.dp = dp
+        self.bot = bot
+        self.max_pending = max_pending
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks = set()
+        self._last = {}
+
+    @property
+    def pending(self):
+        return len(self._tasks)
+
+    def submit(self, update: Update, key=None):
+        if len(self._tasks) >= self.max_pending:
+            return False
+
+        previous = self._last.get(key) if key is not None else None
+        task = asyncio.create_task(self._process(update, previous))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if key is not None:
+            self._last[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return True
+
+    def submit_json(self, payload: dict):
+        update = Update.model_validate(payload, context={"bot": self.bot})
+        return self.submit(update, shard_key(payload))
+
+    def _forget(self, key, task):
+        if self._last.get(key) is task:
+            del self._last[key]
+
+    async def _process(self, update: Update, previous: asyncio.Task = None):
+        if previous is not None:
+            # Оновлення одного користувача обробляються по черзі
+            await asyncio.wait({previous})
+        async with self._semaphore:
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception:
+                logging.exception(f"Помилка обробки оновлення {update.update_id}")
+
+    async def drain(self, timeout: float = 30):
+        if self._tasks:
+            await asyncio.wait(set(self._tasks), timeout=timeout)
+
+
+def create_webhook_router(processor, path: str = WEBHOOK_PATH, secret: str = WEBHOOK_SECRET):
+    router = APIRouter()
+
+    @router.post(path, include_in_schema=False)
+    async def telegram_webhook(request: Request, x_telegram_bot_api_secret_token: str = Header(None)):
+        if secret and not hmac.compare_digest(x_telegram_bot_api_secret_token or "", secret):
+            raise HTTPException(status_code=403)
+
+        # Некоректне оновлення Telegram надсилав би повторно без кінця, тому воно лише логується
+        try:
+            payload = await request.json()
+            if not isinstance(payload, dict):
+                raise ValueError("очікується JSON-об'єкт")
+            accepted = processor.submit_json(payload)
+        except (ValueError, ValidationError) as e:
+            logging.warning(f"Некоректне оновлення webhook пропущено: {e}")
+            return Response(status_code=200)
+
+        # Відповідаємо одразу, обробка йде у фоні; при перевантаженні Telegram повторить запит пізніше
+        if not accepted:
+            return Response(status_code=503)
+        return Response(status_code=200)
+
+    return router
+
+
+def create_processor(dp: Dispatcher, bot: Bot):
+    return UpdateProcessor(dp, bot, WEBHOOK_CONCURRENCY, WEBHOOK_MAX_PENDING)
@@ -0,0 +1,220 @@
+import codecs
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+
+from bot.config import EXPENSE_MIN_YEAR, EXPENSE_MAX_YEARS_AHEAD
+
+NAME_COLUMNS = {"назва", "name"}
+DATE_COLUMNS = {"дата", "date"}
+AMOUNT_COLUMNS = {"сума (грн)", "сума", "amount", "uah"}
+DATE_FORMATS = ("%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y")
+CSV_DELIMITERS = ",;\t"
+
+# Рядок швидкого введення: "19.03.2025 Продукти 550"
+QUICK_ENTRY_RE = re.compile(r"^\s*(\d{2}\.\d{2}\.\d{4})\s+(.+?)\s+(\d+(?:[.,]\d+)?)\s*(?:грн)?\s*$")
+
+# Без заголовка очікується порядок: дата, назва, сума
+DEFAULT_COLUMNS = (1, 0, 2)
+
+
+class ImportFileError(Exception):
+    pass
+
+
+def detect_encoding(path: str):
+    # Excel з українською локаллю зберігає CSV у cp1251; UTF-8 перевіряється по всьому файлу
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b""):
+                decoder.decode(chunk)
+            decoder.decode(b"", final=True)
+    except UnicodeDecodeError:
+        return "cp1251"
+    return "utf-8-sig"
+
+
+def read_csv(path: str):
+    try:
+        with open(path, newline="", encoding=detect_encoding(path)) as f:
+            sample = f.read(4096)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=CSV_DELIMITERS)
+            except csv.Error:
+                # Sniffer не впорається з нерівними рядками; тоді роздільник - найчастіший у першому рядку
+                first_line = sample.splitlines()[0] if sample else ""
+                dialect = csv.excel()
+                dialect.delimiter = max(CSV_DELIMITERS, key=first_line.count)
+            yield from csv.reader(f, dialect)
+    except UnicodeDecodeError:
+        raise ImportFileError("файл не в кодуванні UTF-8 чи Windows-1251")
+    except csv.Error as e:
+        raise ImportFileError(f"некоректний CSV ({e})")
+
+
+def read_xlsx(path: str):
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    # read_only: рядки читаються потоково, книга не завантажується в пам'ять повністю
+    try:
+        workbook = load_workbook(path, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile):
+        raise ImportFileError("файл не є книгою XLSX")
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def find_columns(header):
+    names = [str(value).strip().lower() if value is not None else "" for value in header]
+    found = []
+    for aliases in (NAME_COLUMNS, DATE_COLUMNS, AMOUNT_COLUMNS):
+        index = next((i for i, name in enumerate(names) if name in aliases), None)
+        if index is None:
+            return None
+        found.append(index)
+    return tuple(found)
+
+
+def is_plausible_date(day: date):
+    # Опечатки на кшталт 0025 чи 2205 року інакше створюють секції на століття вперед
+    return EXPENSE_MIN_YEAR <= day.year <= date.today().year + EXPENSE_MAX_YEARS_AHEAD
+
+
+def check_date(day: datetime):
+    if not is_plausible_date(day):
+        raise ValueError(f"неправдоподібна дата '{day:%d.%m.%Y}'")
+    return day
+
+
+def parse_date_value(value):
+    if isinstance(value, datetime):
+        return check_date(value.replace(hour=0, minute=0, second=0, microsecond=0))
+    if isinstance(value, date):
+        return check_date(datetime(value.year, value.month, value.day))
+
+    text = str(value).strip()
+    for date_format in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(text, date_format)
+        except ValueError:
+            continue
+        return check_date(parsed)
+    raise ValueError(f"невірна дата '{text}'")
+
+
+def parse_amount_value(value):
+    if isinstance(value, (int, float)):
+        amount = float(value)
+    else:
+        text = str(value).strip().replace(" ", "").replace("\xa0", "").replace(",", ".")
+        try:
+            amount = float(text)
+        except ValueError:
+            raise ValueError(f"невірна сума '{value}'")
+
+    if amount <= 0:
+        raise ValueError("сума повинна бути більшою за нуль")
+    return amount
+
+
+def parse_row(values, columns):
+    name_i, date_i, amount_i = columns
+    try:
+        name, date_value, amount = values[name_i], values[date_i], values[amount_i]
+    except IndexError:
+        raise ValueError("не вистачає колонок")
+
+    name = str(name).strip() if name is not None else ""
+    if not name:
+        raise ValueError("порожня назва")
+    if date_value in (None, ""):
+        raise ValueError("порожня дата")
+
+    return parse_date_value(date_value), name, parse_amount_value(amount)
+
+
+def is_blank(values):
+    return all(value is None or str(value).strip() == "" for value in values)
+
+
+def parse_expense_file(path: str, filename: str, max_rows: int):
+    reader = read_xlsx if filename.lower().endswith(".xlsx") else read_csv
+
+    rows = []
+    errors = []
+    columns = None
+
+    for line_no, values in enumerate(reader(path), start=1):
+        if not values or is_blank(values):
+            continue
+
+        if columns is None:
+            columns = find_columns(values)
+            if columns is not None:
+                continue
+            columns = DEFAULT_COLUMNS
+
+        # Рядки підсумків з нашого ж звіту пропускаються
+        name_value = values[columns[0]] if len(values) > columns[0] else None
+        if isinstance(name_value, str) and name_value.startswith("Загальна сума"):
+            continue
+
+        if len(rows) >= max_rows:
+            errors.append((line_no, f"перевищено ліміт у {max_rows} рядків, решту файлу пропущено"))
+            break
+
+        try:
+            rows.append(parse_row(values, columns))
+        except ValueError as ex:
+            errors.append((line_no, str(ex)))
+
+    return rows, errors
+
+
+def parse_quick_entry(text: str, max_lines: int):
+    rows = []
+    errors = []
+
+    lines = [(line_no, line) for line_no, line in enumerate(text.splitlines(), start=1) if line.strip()]
+    if len(lines) > max_lines:
+        return rows, [(0, f"забагато рядків, максимум {max_lines}")]
+
+    for line_no, line in lines:
+        match = QUICK_ENTRY_RE.match(line)
+        if not match:
+            errors.append((line_no, "очікується формат 'dd.mm.YYYY Назва Сума'"))
+            continue
+
+        date_str, name, amount_str = match.groups()
+        try:
+            rows.append((check_date(datetime.strptime(date_str, "%d.%m.%Y")), name, parse_amount_value(amount_str)))
+        except ValueError as ex:
+            errors.append((line_no, str(ex)))
+
+    return rows, errors
+
+
+def to_expense_values(rows, rates: dict):
+    values = []
+    for expense_date, name, amount in rows:
+        usd_rate = rates.get(expense_date.date())
+        values.append({
+            "name": name,
+            "date": expense_date,
+            "uah": amount,
+            "usd": round(amount / usd_rate, 2) if usd_rate else None,
+        })
+    return values
+
+
+def format_errors(errors, limit: int = 20):
+    lines = [f"Рядок {line_no}: {message}" for line_no, message in errors[:limit]]
+    if len(errors) > limit:
+        lines.append(f"... та ще {len(errors) - limit} помилок")
+    return "\n".join(lines)
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import multiprocessing
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from bot.config import REPORT_WORKERS, IO_WORKERS, JOB_QUEUE_LIMIT, JOB_USER_LIMIT, REPORT_TIMEOUT
+
+
+class QueueFull(Exception):
+    pass
+
+
+def discard_result(job):
+    # Результат, на який уже ніхто не чекає: тимчасовий файл звіту видаляється
+    if job.cancelled() or job.exception() is not None:
+        return
+    discard = getattr(job.result(), "discard", None)
+    if discard is not None:
+        discard()
+
+
+class JobQueue:
+    def __init__(self, name: str, executor_factory, workers: int, max_pending: int, max_per_user: int,
+                 timeout: float = None):
+        self.name = name
+        self.executor_factory = executor_factory
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_per_user = max_per_user
+        self.timeout = timeout
+        self._pending = OrderedDict()
+        self._size = 0
+        self._executor = None
+        self._wakeup = None
+        self._tasks = []
+
+    def _ensure_started(self):
+        if self._executor is not None:
+            return
+        self._executor = self.executor_factory()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, key, fn, *args, timeout: float = None):
+        self._ensure_started()
+
+        if self._size >= self.max_pending:
+            raise QueueFull(f"{self.name}: черга переповнена")
+        user_jobs = self._pending.setdefault(key, deque())
+        if len(user_jobs) >= self.max_per_user:
+            raise QueueFull(f"{self.name}: забагато задач від {key}")
+
+        future = asyncio.get_running_loop().create_future()
+        user_jobs.append((future, fn, args, timeout or self.timeout))
+        self._size += 1
+        self._wakeup.set()
+
+        # Якщо той, хто чекає, скасований - задача ще в черзі буде пропущена
+        return await future
+
+    def _next_job(self):
+        # Кругова черга по користувачах: по одній задачі від кожного по черзі
+        key, user_jobs = self._pending.popitem(last=False)
+        job = user_jobs.popleft()
+        if user_jobs:
+            self._pending[key] = user_jobs
+        self._size -= 1
+        return job
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            while not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            future, fn, args, timeout = self._next_job()
+            if future.done():
+                continue
+
+            job = loop.run_in_executor(self._executor, fn, *args)
+            try:
+                result = await asyncio.wait_for(asyncio.shield(job), timeout)
+            except asyncio.CancelledError:
+                job.add_done_callback(discard_result)
+                if not future.done():
+                    future.cancel()
+                raise
+            except asyncio.TimeoutError as ex:
+                logging.warning(f"{self.name}: задача {getattr(fn, '__name__', fn)} перевищила {timeout} с")
+                if not future.done():
+                    future.set_exception(ex)
+                # Процес чи потік не перервати: слот зайнятий, доки задача справді не завершиться
+                job.add_done_callback(discard_result)
+                await asyncio.wait([job])
+                continue
+            except Exception as ex:
+                if not future.done():
+                    future.set_exception(ex)
+                continue
+
+            if future.done():
+                discard_result(job)
+            else:
+                future.set_result(result)
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        for user_jobs in self._pending.values():
+            for future, *_ in user_jobs:
+                future.cancel()
+        self._pending.clear()
+        self._size = 0
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Однакові одночасні запити чекають одне обчислення замість запуску власного
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+
+    def __contains__(self, key):
+        return key in self._calls
+
+    async def do(self, key, fn, *args):
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn(*args))
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+
+        # shield: скасування одного з тих, хто чекає, не зупиняє обчислення для інших
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+
+# Процеси для важких обчислень (pandas, xlsx), потоки - для блокуючого вводу/виводу
+report_jobs = JobQueue(
+    "reports",
+    lambda: ProcessPoolExecutor(REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn")),
+    REPORT_WORKERS, JOB_QUEUE_LIMIT, JOB_USER_LIMIT, REPORT_TIMEOUT
+)
+io_jobs = JobQueue(
+    "io",
+    lambda: ThreadPoolExecutor(IO_WORKERS, thread_name_prefix="io-job"),
+    IO_WORKERS, JOB_QUEUE_LIMIT, JOB_USER_LIMIT
+)
+
+
+async def shutdown_jobs():
+    await report_jobs.shutdown()
+    await io_jobs.shutdown()
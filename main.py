@@ -1,32 +1,64 @@
+import argparse
 import asyncio
 import logging
 import uvicorn
-from bot.run import start_bot
+from bot.config import BOT_MODE, BOT_WORKERS, HTTP_HOST, HTTP_PORT
+from bot.run import start_bot, start_webhook, get_bot, dp
+from bot.webhook import create_processor, create_webhook_router
+from bot.supervisor import Supervisor, run_supervised_polling, run_supervised_webhook
 from fastapi import FastAPI
-from database import SessionLocal, engine, Base
+from api import router as api_router
+from metrics import router as metrics_router
+from database import DB_SCHEMA_CHECK, check_schema
 
 #python main.py старт бота
+#python main.py --mode webhook - оновлення від Telegram приходять на FastAPI
+#python main.py --workers 4 - оновлення обробляють 4 процеси (розподіл за користувачем)
 
-Base.metadata.create_all(bind=engine)
 app = FastAPI()
+app.include_router(api_router)
+app.include_router(metrics_router)
 
 
 async def start_fastapi():
-    config = uvicorn.Config(app, log_level="info")
+    config = uvicorn.Config(app, host=HTTP_HOST, port=HTTP_PORT, log_level="info")
     server = uvicorn.Server(config)
     await server.serve()
 
 
-async def main():
+async def main(mode: str = BOT_MODE, workers: int = BOT_WORKERS):
     logging.basicConfig(level=logging.INFO)
+    if DB_SCHEMA_CHECK:
+        await asyncio.to_thread(check_schema)
+
+    if workers > 1:
+        supervisor = Supervisor(workers)
+        supervisor.start()
+        if mode == "webhook":
+            app.include_router(create_webhook_router(supervisor))
+            bot_task = run_supervised_webhook(supervisor)
+        else:
+            bot_task = run_supervised_polling(supervisor)
+    elif mode == "webhook":
+        processor = create_processor(dp, get_bot())
+        app.include_router(create_webhook_router(processor))
+        bot_task = start_webhook(processor)
+    else:
+        bot_task = start_bot()
+
     await asyncio.gather(
         start_fastapi(),
-        start_bot()
+        bot_task
     )
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", choices=["polling", "webhook"], default=BOT_MODE)
+    parser.add_argument("--workers", type=int, default=BOT_WORKERS)
+    args = parser.parse_args()
+
     try:
-        asyncio.run(main())
+        asyncio.run(main(args.mode, args.workers))
     except KeyboardInterrupt:
         print("Вихід")
@@ -0,0 +1,101 @@
+import os
+import time
+
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, \
+    generate_latest, multiprocess
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = tuple(10_000 * 4 ** i for i in range(8))
+OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "BEGIN", "COMMIT", "ROLLBACK"}
+
+HANDLER_SECONDS = Histogram("bot_handler_seconds", "Час обробника aiogram", ["handler"])
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Помилки в обробниках aiogram", ["handler"])
+
+DB_QUERY_SECONDS = Histogram("db_query_seconds", "Час SQL-запиту", ["engine", "operation"], buckets=QUERY_BUCKETS)
+DB_QUERY_ERRORS = Counter("db_query_errors_total", "Помилки SQL-запитів", ["engine"])
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds", "Очікування з'єднання з пулу", ["engine"], buckets=QUERY_BUCKETS
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "З'єднання, видані з пулу", ["engine"], multiprocess_mode="livesum"
+)
+DB_POOL_CAPACITY = Gauge(
+    "db_pool_capacity", "Розмір пулу разом з overflow", ["engine"], multiprocess_mode="livesum"
+)
+
+RATE_FETCH_SECONDS = Histogram("rate_fetch_seconds", "Час отримання курсу від джерела", ["provider"])
+RATE_FETCH_FAILURES = Counter("rate_fetch_failures_total", "Невдалі спроби отримати курс", ["provider"])
+
+REPORT_SECONDS = Histogram(
+    "report_render_seconds", "Час формування звіту разом з чергою", buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+REPORT_BYTES = Histogram("report_size_bytes", "Розмір XLSX-звіту", buckets=SIZE_BUCKETS)
+
+
+class TimedQueuePool(QueuePool):
+    # Ім'я рушія для міток; задається в instrument_engine
+    _metrics_name = "db"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT_SECONDS.labels(self._metrics_name).observe(time.perf_counter() - started)
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool, TimedQueuePool):
+    pass
+
+
+def statement_operation(statement: str):
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return operation if operation in OPERATIONS else "OTHER"
+
+
+def instrument_engine(engine, name: str, capacity: int = None):
+    sync_engine = getattr(engine, "sync_engine", engine)
+    sync_engine.pool._metrics_name = name
+    if capacity is not None:
+        DB_POOL_CAPACITY.labels(name).set(capacity)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        DB_QUERY_SECONDS.labels(name, statement_operation(statement)).observe(time.perf_counter() - started)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        DB_QUERY_ERRORS.labels(name).inc()
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+    @event.listens_for(sync_engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKED_OUT.labels(name).inc()
+
+    @event.listens_for(sync_engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        DB_POOL_CHECKED_OUT.labels(name).dec()
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    # З PROMETHEUS_MULTIPROC_DIR метрики збираються з усіх процесів (обробники, пул звітів)
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
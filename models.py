@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, BigInteger
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Float, BigInteger, Date, PrimaryKeyConstraint, \
+    Index
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
@@ -10,17 +12,60 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     telegram_id = Column(BigInteger, unique=True, nullable=False)
     username = Column(String, nullable=True)
+    # Збільшується в транзакції кожного запису витрат; ключ кешу звітів і ETag
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
     expenses = relationship("Expense", back_populates="user")
 
 
 class Expense(Base):
     __tablename__ = "expenses"
 
-    id = Column(Integer, primary_key=True, index=True)
+    # У Postgres таблиця секціонована за date помісячно, первинний ключ (id, date) задає міграція
+    id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     name = Column(String, nullable=False)
-    date = Column(DateTime, default=datetime.datetime.utcnow)
+    date = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
     uah = Column(Float, nullable=False)
-    usd = Column(Float, nullable=False)
+    usd = Column(Float, nullable=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     user = relationship("User", back_populates="expenses")
+
+    __table_args__ = (
+        Index("ix_expenses_user_id_date_id", "user_id", "date", "id", postgresql_include=["name", "uah", "usd"]),
+    )
+
+
+class ExchangeRate(Base):
+    __tablename__ = "exchange_rates"
+
+    date = Column(Date, nullable=False)
+    currency = Column(String(3), nullable=False)
+    rate = Column(Float, nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("date", "currency"),
+        Index("ix_exchange_rates_currency_date", "currency", "date"),
+    )
+
+
+class ExpenseRollup(Base):
+    __tablename__ = "expense_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    month = Column(Date, nullable=False)
+    uah_total = Column(Float, nullable=False, default=0)
+    usd_total = Column(Float, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("user_id", "month"),
+    )
+
+
+class FsmState(Base):
+    __tablename__ = "fsm_states"
+
+    key = Column(String, primary_key=True)
+    state = Column(String, nullable=True)
+    data = Column(JSONB(none_as_null=True), nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
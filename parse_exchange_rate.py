@@ -1,3 +1,5 @@
+import logging
+
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
@@ -27,7 +29,7 @@ def usd_exchange_rate():
         return usd_rate_float
 
     except Exception as ex:
-        print(f"Курс не знайдено: {ex}")
+        logging.warning(f"Курс не знайдено: {ex}")
         return None
 
     finally:
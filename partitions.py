@@ -0,0 +1,177 @@
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+
+from bot.config import PARTITION_MONTHS_AHEAD, PARTITION_CHECK_INTERVAL, ARCHIVE_DIR
+from database import engine
+from rollups import rollup_sql, month_start, next_month
+
+PARTITION_RE = re.compile(r"^expenses_(\d{4})_(\d{2})$")
+
+ENSURE_SQL = text(
+    "SELECT ensure_expense_partitions(:first_month, "
+    "(date_trunc('month', CAST(:today AS date)) + make_interval(months => :ahead))::date)"
+)
+ATTACHED_SQL = text(
+    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+    "WHERE i.inhparent = 'expenses'::regclass ORDER BY c.relname"
+)
+
+
+def partition_name(month: date):
+    return f"expenses_{month:%Y_%m}"
+
+
+def partition_month(name: str):
+    match = PARTITION_RE.match(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def ensure_params(ahead: int):
+    today = date.today()
+    # Попередній місяць теж: витрати заднім числом не мають потрапляти в дефолтну секцію
+    previous = month_start(month_start(today) - timedelta(days=1))
+    return {"first_month": previous, "today": today, "ahead": ahead}
+
+
+def ensure(ahead: int = PARTITION_MONTHS_AHEAD):
+    with engine.begin() as conn:
+        return conn.execute(ENSURE_SQL, ensure_params(ahead)).scalar()
+
+
+async def ensure_async(async_engine, ahead: int = PARTITION_MONTHS_AHEAD):
+    async with async_engine.begin() as conn:
+        if conn.dialect.name != "postgresql":
+            return 0
+        return (await conn.execute(ENSURE_SQL, ensure_params(ahead))).scalar()
+
+
+async def run_partition_maintenance(async_engine, interval: int = PARTITION_CHECK_INTERVAL):
+    while True:
+        try:
+            created = await ensure_async(async_engine)
+            if created:
+                logging.info(f"Створено нових секцій витрат: {created}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.warning(f"Не вдалося створити майбутні секції витрат: {e}")
+        await asyncio.sleep(interval)
+
+
+def list_partitions():
+    with engine.connect() as conn:
+        return conn.execute(text(
+            "SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bound, "
+            "pg_total_relation_size(c.oid) AS size FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'expenses'::regclass ORDER BY c.relname"
+        )).all()
+
+
+def rebuild_month_rollups(conn, month: date):
+    # Підсумки архівованого місяця видаляються, після відновлення - рахуються заново
+    params = {"start": month, "end": next_month(month)}
+    conn.execute(text("DELETE FROM expense_rollups WHERE month = :start"), params)
+    conn.execute(text(
+        "INSERT INTO expense_rollups (user_id, month, uah_total, usd_total, count) "
+        + rollup_sql("postgresql", "AND date >= :start AND date < :end")
+    ), params)
+
+
+BUMP_MONTH_USERS_SQL = text(
+    "UPDATE users SET data_version = data_version + 1 "
+    "WHERE id IN (SELECT user_id FROM expense_rollups WHERE month = :month)"
+)
+
+
+def archive(before: date, directory: str = ARCHIVE_DIR):
+    os.makedirs(directory, exist_ok=True)
+    with engine.connect() as conn:
+        names = conn.execute(ATTACHED_SQL).scalars().all()
+    months = [(name, partition_month(name)) for name in names]
+    archived = []
+
+    for name, month in months:
+        if month is None or next_month(month) > before:
+            continue
+
+        # Від'єднання і підсумки - одна транзакція: звіти не бачать місяць ні в рядках, ні в rollups
+        with engine.begin() as conn:
+            conn.execute(text(f'ALTER TABLE expenses DETACH PARTITION "{name}"'))
+            conn.execute(BUMP_MONTH_USERS_SQL, {"month": month})
+            conn.execute(text("DELETE FROM expense_rollups WHERE month = :month"), {"month": month})
+
+        path = os.path.join(directory, f"{name}.csv.gz")
+        connection = engine.raw_connection()
+        try:
+            with connection.cursor() as cursor, gzip.open(path, "wb") as f:
+                cursor.copy_expert(f'COPY "{name}" TO STDOUT WITH (FORMAT csv, HEADER)', f)
+            connection.commit()
+        finally:
+            connection.close()
+
+        # Таблиця видаляється лише після успішного експорту; інакше її можна приєднати через restore
+        with engine.begin() as conn:
+            conn.execute(text(f'DROP TABLE "{name}"'))
+        archived.append(path)
+
+    return archived
+
+
+def restore(source: str):
+    name = os.path.basename(source).split(".")[0]
+    month = partition_month(name)
+    if month is None:
+        raise ValueError(f"Очікується архів або таблиця expenses_YYYY_MM, отримано {source}")
+
+    with engine.begin() as conn:
+        if source.endswith(".csv.gz"):
+            conn.execute(text(f'CREATE TABLE "{name}" (LIKE expenses INCLUDING DEFAULTS)'))
+            with gzip.open(source, "rb") as f:
+                conn.connection.cursor().copy_expert(f'COPY "{name}" FROM STDIN WITH (FORMAT csv, HEADER)', f)
+
+        params = {"start": month, "end": next_month(month)}
+        # Витрати, додані за цей місяць після архівації, лежать у дефолтній секції
+        conn.execute(text(
+            f'WITH moved AS (DELETE FROM expenses_default WHERE date >= :start AND date < :end RETURNING *) '
+            f'INSERT INTO "{name}" SELECT * FROM moved'
+        ), params)
+        conn.execute(text(
+            f"ALTER TABLE expenses ATTACH PARTITION \"{name}\" FOR VALUES FROM ('{month}') TO ('{next_month(month)}')"
+        ))
+        rebuild_month_rollups(conn, month)
+        conn.execute(BUMP_MONTH_USERS_SQL, {"month": month})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Помісячні секції таблиці expenses")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ensure_parser = subparsers.add_parser("ensure", help="Створити секції на найближчі місяці")
+    ensure_parser.add_argument("--ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    subparsers.add_parser("list", help="Приєднані секції та їх розмір")
+    archive_parser = subparsers.add_parser("archive", help="Від'єднати і вивантажити місяці до дати (dd.mm.YYYY)")
+    archive_parser.add_argument("before")
+    archive_parser.add_argument("--dir", default=ARCHIVE_DIR)
+    restore_parser = subparsers.add_parser("restore", help="Повернути місяць з архіву .csv.gz або від'єднаної таблиці")
+    restore_parser.add_argument("source")
+    args = parser.parse_args()
+
+    if args.command == "ensure":
+        print(f"Створено секцій: {ensure(args.ahead)}")
+    elif args.command == "list":
+        for row in list_partitions():
+            print(f"{row.name}: {row.bound}, {row.size / 1024 / 1024:.1f} МБ")
+    elif args.command == "archive":
+        paths = archive(datetime.strptime(args.before, "%d.%m.%Y").date(), args.dir)
+        for path in paths:
+            print(f"Архівовано: {path}")
+        print(f"Архівовано секцій: {len(paths)}")
+    else:
+        restore(args.source)
+        print(f"Відновлено: {args.source}")
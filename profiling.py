@@ -0,0 +1,143 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event, Select
+
+from bot.config import SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN, SLOW_QUERY_EXPLAIN_INTERVAL, PROFILE_INTERVAL_MS, \
+    PROFILE_MAX_SECONDS
+
+logger = logging.getLogger("slow_query")
+
+LOCKING_RE = re.compile(r"\bFOR\s+(UPDATE|SHARE|NO\s+KEY\s+UPDATE|KEY\s+SHARE)\b", re.IGNORECASE)
+MAX_LOGGED_PARAMS = 1000
+
+
+class SlowQueryLog:
+    def __init__(self, explain_engine=None, threshold_ms: int = SLOW_QUERY_MS, explain: bool = SLOW_QUERY_EXPLAIN,
+                 explain_interval: int = SLOW_QUERY_EXPLAIN_INTERVAL):
+        self.explain_engine = explain_engine
+        self.threshold = threshold_ms / 1000
+        self.explain = explain and explain_engine is not None
+        self.explain_interval = explain_interval
+        self._explained = OrderedDict()
+        self._executor = None
+
+    def install(self, engine):
+        sync_engine = getattr(engine, "sync_engine", engine)
+        event.listen(sync_engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", self.after_cursor_execute)
+        event.listen(sync_engine, "handle_error", self.handle_error)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["slow_query_started"].pop()
+        if elapsed < self.threshold:
+            return
+
+        logger.warning(
+            f"Повільний запит {elapsed * 1000:.0f} мс: {statement}\nПараметри: {str(parameters)[:MAX_LOGGED_PARAMS]}"
+        )
+        if self.explain and not executemany and self._should_explain(statement, context):
+            self._submit_explain(context.compiled.statement, context.compiled_parameters[0], statement)
+
+    def handle_error(self, context):
+        # Запит з помилкою не доходить до after_cursor_execute: інакше стек часу зсувається
+        started = context.connection.info.get("slow_query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+    def _should_explain(self, statement: str, context):
+        if context is None or context.compiled is None:
+            return False
+        # EXPLAIN ANALYZE виконує запит повторно, тому лише select() з таблиць: text() і
+        # SELECT функції (ensure_expense_partitions) можуть змінювати дані
+        element = context.compiled.statement
+        if not isinstance(element, Select) or not element.get_final_froms() or LOCKING_RE.search(statement):
+            return False
+
+        # Один і той самий запит пояснюється не частіше за explain_interval
+        now = time.monotonic()
+        last = self._explained.get(statement)
+        if last is not None and now - last < self.explain_interval:
+            return False
+        self._explained[statement] = now
+        self._explained.move_to_end(statement)
+        while len(self._explained) > 1000:
+            self._explained.popitem(last=False)
+        return True
+
+    def _submit_explain(self, element, params, statement):
+        # Окреме з'єднання у фоновому потоці: обробник не чекає на повторне виконання
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix="explain")
+        self._executor.submit(self._explain, element, params, statement)
+
+    def _explain(self, element, params, statement):
+        try:
+            with self.explain_engine.connect() as conn:
+                if conn.dialect.name != "postgresql":
+                    return
+                compiled = element.compile(dialect=conn.dialect)
+                bound = {**compiled.params, **params}
+                plan = conn.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS) " + str(compiled), bound).scalars().all()
+                conn.rollback()
+        except Exception as e:
+            logger.warning(f"Не вдалося отримати EXPLAIN для {statement[:200]}: {e}")
+            return
+        logger.warning(f"План повільного запиту {statement[:200]}:\n" + "\n".join(plan))
+
+
+# Стеки всіх потоків процесу у collapsed-форматі ("кадр;кадр;кадр кількість") для flamegraph
+class SamplingProfiler:
+    def __init__(self, interval_ms: float = PROFILE_INTERVAL_MS, max_seconds: int = PROFILE_MAX_SECONDS):
+        self.interval = interval_ms / 1000
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._lock.locked()
+
+    @staticmethod
+    def _frame_name(frame):
+        code = frame.f_code
+        return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+    def _collapse(self, frame):
+        names = []
+        while frame is not None:
+            names.append(self._frame_name(frame))
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def run(self, seconds: float):
+        # Блокуючий виклик: запускати в окремому потоці (asyncio.to_thread)
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Профілювання вже виконується")
+        try:
+            seconds = min(seconds, self.max_seconds)
+            own_thread = threading.get_ident()
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id != own_thread:
+                        stack = self._collapse(frame)
+                        stacks[f"{thread_names.get(thread_id, thread_id)};{stack}"] += 1
+                time.sleep(self.interval)
+        finally:
+            self._lock.release()
+
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import time
+
+from bot.config import RATE_CACHE_TTL, RATE_CACHE_MAX_STALE, RATE_RETRY_DELAY
+from rate_providers import rate_fetcher
+
+
+class RateCache:
+    def __init__(self, fetch, ttl: int, max_stale: int, retry_delay: int):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.retry_delay = retry_delay
+        self._rate = None
+        self._fetched_at = 0.0
+        self._failed_at = None
+        self._inflight = None
+        self.listeners = []
+
+    def age(self):
+        if self._rate is None:
+            return None
+        return time.monotonic() - self._fetched_at
+
+    def _recently_failed(self):
+        return self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_delay
+
+    def peek(self):
+        return self._rate
+
+    async def get(self):
+        age = self.age()
+
+        if age is not None and age < self.ttl:
+            return self._rate
+
+        # Застарілий курс віддаємо одразу, а оновлюємо його у фоні
+        if age is not None and age < self.max_stale:
+            self._refresh_in_background()
+            return self._rate
+
+        return await self.refresh()
+
+    async def refresh(self):
+        if self._inflight is None:
+            if self._recently_failed():
+                return self._rate
+            self._inflight = asyncio.create_task(self._do_refresh())
+            self._inflight.add_done_callback(self._clear_inflight)
+
+        # shield: скасування одного з очікувачів не скасовує спільний запит
+        return await asyncio.shield(self._inflight)
+
+    def _refresh_in_background(self):
+        if self._inflight is not None:
+            return
+        if self._recently_failed():
+            return
+        self._inflight = asyncio.create_task(self._do_refresh())
+        self._inflight.add_done_callback(self._clear_inflight)
+
+    def _clear_inflight(self, task):
+        self._inflight = None
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(f"Помилка оновлення курсу: {task.exception()}")
+
+    async def _do_refresh(self):
+        rate = await self._fetch()
+
+        if rate:
+            self._rate = rate
+            self._fetched_at = time.monotonic()
+            self._failed_at = None
+            for listener in self.listeners:
+                listener(rate)
+        else:
+            self._failed_at = time.monotonic()
+            logging.warning("Не вдалося оновити курс долара, використовується попереднє значення")
+
+        return self._rate
+
+    async def run_refresher(self):
+        # Оновлюємо трохи раніше, ніж курс застаріє, щоб запити не чекали на мережу
+        interval = max(self.ttl * 0.8, 1)
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                logging.error(f"Помилка фонового оновлення курсу: {ex}")
+            await asyncio.sleep(interval)
+
+
+usd_rate_cache = RateCache(rate_fetcher.fetch, RATE_CACHE_TTL, RATE_CACHE_MAX_STALE, RATE_RETRY_DELAY)
+
+
+async def get_usd_rate():
+    return await usd_rate_cache.get()
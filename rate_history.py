@@ -0,0 +1,162 @@
+import argparse
+import asyncio
+import logging
+from bisect import bisect_right, insort
+from datetime import date, datetime, timedelta
+
+import aiohttp
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from bot.config import RATE_NBU_HISTORY_URL
+from database import SessionLocal
+from models import ExchangeRate
+from rate_cache import get_usd_rate, usd_rate_cache
+
+
+class RateHistory:
+    def __init__(self, currency: str):
+        self.currency = currency
+        self._dates = []
+        self._rates = []
+
+    def __len__(self):
+        return len(self._dates)
+
+    def load(self, db: Session):
+        rows = db.query(ExchangeRate.date, ExchangeRate.rate).filter(
+            ExchangeRate.currency == self.currency
+        ).order_by(ExchangeRate.date).all()
+
+        self._dates = [row.date for row in rows]
+        self._rates = [row.rate for row in rows]
+
+    def add(self, day: date, rate: float):
+        i = bisect_right(self._dates, day)
+        if i and self._dates[i - 1] == day:
+            self._rates[i - 1] = rate
+            return
+        insort(self._dates, day)
+        self._rates.insert(i, rate)
+
+    def lookup(self, day: date):
+        # Курс на найближчий попередній (або той самий) день
+        i = bisect_right(self._dates, day)
+        if i == 0:
+            return None
+        return self._rates[i - 1]
+
+
+usd_history = RateHistory("USD")
+
+
+def save_rates(db: Session, currency: str, rates: dict):
+    if not rates:
+        return
+
+    stmt = insert(ExchangeRate).values([
+        {"date": day, "currency": currency, "rate": rate} for day, rate in rates.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ExchangeRate.date, ExchangeRate.currency],
+        set_={"rate": stmt.excluded.rate}
+    )
+    db.execute(stmt)
+    db.commit()
+
+
+def load_usd_history():
+    db = SessionLocal()
+    try:
+        usd_history.load(db)
+    finally:
+        db.close()
+    logging.info(f"Завантажено історію курсу: {len(usd_history)} днів")
+
+
+def _save_today_rate(rate: float):
+    db = SessionLocal()
+    try:
+        save_rates(db, usd_history.currency, {date.today(): rate})
+    except Exception as ex:
+        logging.error(f"Не вдалося зберегти курс: {ex}")
+    finally:
+        db.close()
+
+
+def _record_today_rate(rate: float):
+    usd_history.add(date.today(), rate)
+    asyncio.get_running_loop().run_in_executor(None, _save_today_rate, rate)
+
+
+usd_rate_cache.listeners.append(_record_today_rate)
+
+
+async def usd_rate_for(day: date):
+    if day >= date.today():
+        return await get_usd_rate()
+
+    # Для минулих дат мережа не потрібна: курс береться з історії
+    rate = usd_history.lookup(day)
+    if rate is None:
+        rate = await get_usd_rate()
+    return rate
+
+
+async def usd_rates_for(days):
+    # Один пошук курсу на кожну різну дату
+    return {day: await usd_rate_for(day) for day in set(days)}
+
+
+async def _fetch_nbu_rate(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, day: date):
+    url = RATE_NBU_HISTORY_URL.format(date=day.strftime("%Y%m%d"))
+    async with semaphore:
+        try:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+            return day, float(data[0]["rate"])
+        except Exception as ex:
+            logging.warning(f"Курс на {day} не отримано: {ex!r}")
+            return day, None
+
+
+async def fetch_nbu_history(start: date, end: date, concurrency: int = 5):
+    semaphore = asyncio.Semaphore(concurrency)
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+    async with aiohttp.ClientSession() as session:
+        results = await asyncio.gather(*(_fetch_nbu_rate(session, semaphore, day) for day in days))
+
+    return {day: rate for day, rate in results if rate is not None}
+
+
+def backfill(start: date, end: date, concurrency: int = 5, chunk_size: int = 500):
+    rates = asyncio.run(fetch_nbu_history(start, end, concurrency))
+    items = sorted(rates.items())
+
+    db = SessionLocal()
+    try:
+        for i in range(0, len(items), chunk_size):
+            save_rates(db, usd_history.currency, dict(items[i:i + chunk_size]))
+    finally:
+        db.close()
+
+    return len(items)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Історія курсу долара")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = subparsers.add_parser("backfill", help="Завантажити курси НБУ за період")
+    backfill_parser.add_argument("start", help="dd.mm.YYYY")
+    backfill_parser.add_argument("end", help="dd.mm.YYYY")
+    backfill_parser.add_argument("--concurrency", type=int, default=5)
+    args = parser.parse_args()
+
+    start_day = datetime.strptime(args.start, "%d.%m.%Y").date()
+    end_day = datetime.strptime(args.end, "%d.%m.%Y").date()
+    saved = backfill(start_day, end_day, args.concurrency)
+    print(f"Збережено курсів: {saved}")
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import re
+import time
+
+import aiohttp
+
+from bot.config import RATE_MINFIN_URL, RATE_NBU_URL, RATE_PROVIDER_TIMEOUT, RATE_BREAKER_THRESHOLD, \
+    RATE_BREAKER_RESET
+from jobs import io_jobs
+from metrics import RATE_FETCH_FAILURES, RATE_FETCH_SECONDS
+
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+              'Chrome/91.0.4472.124 Safari/537.36')
+
+
+class ProviderError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: int):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        # Після паузи пропускаємо пробний запит (half-open)
+        return time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class RateProvider:
+    name = "base"
+
+    def __init__(self, timeout: float = RATE_PROVIDER_TIMEOUT, failure_threshold: int = RATE_BREAKER_THRESHOLD,
+                 reset_timeout: int = RATE_BREAKER_RESET):
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+    async def fetch(self, session: aiohttp.ClientSession) -> float:
+        raise NotImplementedError
+
+
+class JsonRateProvider(RateProvider):
+    def __init__(self, name: str, url: str, extract, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.url = url
+        self.extract = extract
+
+    async def fetch(self, session: aiohttp.ClientSession) -> float:
+        async with session.get(self.url, timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+            response.raise_for_status()
+            data = await response.json(content_type=None)
+
+        try:
+            return float(self.extract(data))
+        except (KeyError, IndexError, TypeError, ValueError, StopIteration) as ex:
+            raise ProviderError(f"{self.name}: неочікувана відповідь ({ex})")
+
+
+class HtmlRateProvider(RateProvider):
+    def __init__(self, name: str, url: str, pattern: str, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.url = url
+        self.pattern = re.compile(pattern)
+
+    async def fetch(self, session: aiohttp.ClientSession) -> float:
+        async with session.get(self.url, timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+            response.raise_for_status()
+            html = await response.text()
+
+        match = self.pattern.search(html)
+        if not match:
+            raise ProviderError(f"{self.name}: курс не знайдено на сторінці")
+
+        return float(match.group(1).replace(',', '.'))
+
+
+class SeleniumRateProvider(RateProvider):
+    name = "selenium"
+
+    async def fetch(self, session: aiohttp.ClientSession) -> float:
+        # Імпорт тут, щоб не тягнути selenium, поки він не потрібен
+        from parse_exchange_rate import usd_exchange_rate
+
+        rate = await io_jobs.submit(self.name, usd_exchange_rate)
+        if not rate:
+            raise ProviderError(f"{self.name}: курс не знайдено")
+        return rate
+
+
+class RateFetcher:
+    def __init__(self, providers: list):
+        self.providers = providers
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(headers={"User-Agent": USER_AGENT})
+        return self._session
+
+    async def fetch(self):
+        session = self._get_session()
+
+        for provider in self.providers:
+            if not provider.breaker.allow():
+                continue
+
+            started = time.perf_counter()
+            try:
+                rate = await asyncio.wait_for(provider.fetch(session), provider.timeout)
+                if not 1 < rate < 1000:
+                    raise ProviderError(f"{provider.name}: неправдоподібний курс {rate}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                RATE_FETCH_FAILURES.labels(provider.name).inc()
+                provider.breaker.record_failure()
+                logging.warning(f"Курс не отримано від {provider.name}: {ex!r}")
+                continue
+            finally:
+                RATE_FETCH_SECONDS.labels(provider.name).observe(time.perf_counter() - started)
+
+            provider.breaker.record_success()
+            return rate
+
+        logging.error("Жодне джерело не повернуло курс долара")
+        return None
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+def build_default_providers(minfin_url: str = RATE_MINFIN_URL, nbu_url: str = RATE_NBU_URL):
+    return [
+        HtmlRateProvider("minfin", minfin_url, r'class="[^"]*sc-1x32wa2-9[^"]*"[^>]*>\s*(\d+[.,]\d+)'),
+        JsonRateProvider("nbu", nbu_url, lambda data: data[0]["rate"]),
+        # Браузер лише як остання спроба: секунди часу і сотні МБ пам'яті
+        SeleniumRateProvider(timeout=30),
+    ]
+
+
+rate_fetcher = RateFetcher(build_default_providers())
@@ -0,0 +1,96 @@
+from collections import OrderedDict
+
+from bot.config import REPORT_CACHE_MAX_BYTES, REPORT_FILE_ID_CACHE_SIZE
+
+EMPTY = object()
+# Порожній результат теж займає пам'ять (ключ, запис у словнику); без цього їх кількість не обмежена
+EMPTY_SIZE = 256
+
+
+class ReportCache:
+    # Ключі: (telegram_id, ..., версія даних); записи старих версій користувача видаляються одразу
+    def __init__(self, max_bytes: int, max_file_ids: int):
+        self.max_bytes = max_bytes
+        self.max_file_ids = max_file_ids
+        self._reports = OrderedDict()
+        self._size = 0
+        self._file_ids = OrderedDict()
+        self._versions = {}
+        self._user_keys = {}
+
+    def _track(self, key):
+        telegram_id, version = key[0], key[-1]
+        known = self._versions.get(telegram_id)
+        if known is not None and version <= known:
+            return
+        self._versions[telegram_id] = version
+        for old_key in self._user_keys.pop(telegram_id, ()):
+            if old_key in self._reports:
+                self._remove(old_key)
+            self._file_ids.pop(old_key, None)
+
+    def _remember(self, key):
+        self._user_keys.setdefault(key[0], set()).add(key)
+
+    def _forget(self, key):
+        if key in self._reports or key in self._file_ids:
+            return
+        user_keys = self._user_keys.get(key[0])
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._user_keys[key[0]]
+                self._versions.pop(key[0], None)
+
+    def _remove(self, key):
+        report = self._reports.pop(key)
+        self._size -= EMPTY_SIZE if report is EMPTY else report.size
+
+    def get(self, key):
+        self._track(key)
+        report = self._reports.get(key)
+        if report is not None:
+            self._reports.move_to_end(key)
+        return report
+
+    def put(self, key, report):
+        if report is EMPTY:
+            size = EMPTY_SIZE
+        elif report.data is not None:
+            size = report.size
+        else:
+            # Великі звіти лежать у тимчасових файлах і після відправки видаляються
+            return
+
+        self._track(key)
+        if size > self.max_bytes or key in self._reports or key[-1] < self._versions[key[0]]:
+            return
+
+        self._reports[key] = report
+        self._size += size
+        self._remember(key)
+        while self._size > self.max_bytes:
+            evicted_key, _ = next(iter(self._reports.items()))
+            self._remove(evicted_key)
+            self._forget(evicted_key)
+
+    def get_file_id(self, key):
+        self._track(key)
+        file_id = self._file_ids.get(key)
+        if file_id is not None:
+            self._file_ids.move_to_end(key)
+        return file_id
+
+    def set_file_id(self, key, file_id: str):
+        self._track(key)
+        if key[-1] < self._versions[key[0]]:
+            return
+        self._file_ids[key] = file_id
+        self._file_ids.move_to_end(key)
+        self._remember(key)
+        while len(self._file_ids) > self.max_file_ids:
+            evicted_key, _ = self._file_ids.popitem(last=False)
+            self._forget(evicted_key)
+
+
+report_cache = ReportCache(REPORT_CACHE_MAX_BYTES, REPORT_FILE_ID_CACHE_SIZE)
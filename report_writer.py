@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import uuid
+from typing import NamedTuple, Optional
+
+from bot.config import REPORT_BATCH_SIZE, REPORT_INLINE_MAX
+
+REPORT_HEADER = ("ID", "Назва", "Дата", "Сума (грн)", "Сума (USD)")
+REPORT_SHEET = "Звіт витрат"
+
+
+class ReportFile(NamedTuple):
+    data: Optional[bytes]
+    path: Optional[str]
+    size: int
+    key: Optional[tuple] = None
+    file_id: Optional[str] = None
+
+    def as_input_file(self, filename: str):
+        from aiogram.types import BufferedInputFile, FSInputFile
+
+        if self.file_id is not None:
+            return self.file_id
+        if self.data is not None:
+            return BufferedInputFile(self.data, filename=filename)
+        return FSInputFile(self.path, filename=filename)
+
+    def share(self):
+        # Окреме посилання на той самий файл: кожен отримувач видаляє лише своє
+        if self.path is None:
+            return self
+        path = f"{self.path}.{uuid.uuid4().hex[:8]}"
+        try:
+            os.link(self.path, path)
+        except OSError:
+            shutil.copyfile(self.path, path)
+        return self._replace(path=path)
+
+    def discard(self):
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def write_report(rows, output):
+    import xlsxwriter
+
+    # constant_memory: кожен рядок одразу скидається на диск, пам'ять не росте з кількістю витрат
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    worksheet = workbook.add_worksheet(REPORT_SHEET)
+    bold = workbook.add_format({"bold": True, "border": 1, "align": "center"})
+
+    worksheet.write_row(0, 0, REPORT_HEADER, bold)
+
+    count = 0
+    total_amount_uah = 0
+    total_amount_usd = 0
+    for expense_id, name, date, uah, usd in rows:
+        count += 1
+        total_amount_uah += uah
+        total_amount_usd += usd or 0
+        worksheet.write_row(count, 0, (expense_id, name, date.strftime('%d.%m.%Y'), uah, usd if usd else "None"))
+
+    worksheet.write_row(count + 1, 0, ("", "Загальна сума витрат (грн)", "", total_amount_uah, ""))
+    worksheet.write_row(count + 2, 0, ("", "Загальна сума витрат (USD)", "", "", total_amount_usd))
+
+    workbook.close()
+    return count
+
+
+def export_report(user_id: int, start_date=None, end_date=None):
+    # Виконується в процесі з пулу звітів, тому працює через синхронний рушій
+    from database import SessionLocal
+    from routers import report_query
+
+    fd, path = tempfile.mkstemp(prefix="expense_report_", suffix=".xlsx")
+    try:
+        with os.fdopen(fd, "wb") as output, SessionLocal() as db:
+            result = db.execute(
+                report_query(user_id, start_date, end_date).execution_options(yield_per=REPORT_BATCH_SIZE)
+            )
+            count = write_report((tuple(row) for row in result), output)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    if count == 0:
+        os.remove(path)
+        return None
+
+    # Невеликі файли повертаємо байтами, великі лишаються на диску
+    size = os.path.getsize(path)
+    if size <= REPORT_INLINE_MAX:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.remove(path)
+        return ReportFile(data, None, size)
+
+    return ReportFile(None, path, size)
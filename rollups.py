@@ -0,0 +1,139 @@
+import argparse
+import sys
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import SessionLocal, dialect_insert
+from models import ExpenseRollup
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def next_month(day: date):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def add_delta(deltas: dict, user_id: int, day, uah: float, usd: float, count: int):
+    delta = deltas.setdefault((user_id, month_start(day)), [0.0, 0.0, 0])
+    delta[0] += uah
+    delta[1] += usd or 0
+    delta[2] += count
+    return deltas
+
+
+async def apply_rollup_deltas(db: AsyncSession, deltas: dict):
+    # Викликається в тій самій транзакції, що й зміна витрат
+    if not deltas:
+        return
+
+    stmt = dialect_insert(db, ExpenseRollup).values([
+        {"user_id": user_id, "month": month, "uah_total": uah, "usd_total": usd, "count": count}
+        for (user_id, month), (uah, usd, count) in deltas.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ExpenseRollup.user_id, ExpenseRollup.month],
+        set_={
+            "uah_total": ExpenseRollup.uah_total + stmt.excluded.uah_total,
+            "usd_total": ExpenseRollup.usd_total + stmt.excluded.usd_total,
+            "count": ExpenseRollup.count + stmt.excluded.count,
+        }
+    )
+    await db.execute(stmt)
+
+
+def split_range(start_date: datetime = None, end_date: datetime = None):
+    # Повні місяці всередині періоду рахуються з rollups, краї - з сирих рядків.
+    # Дати витрат зберігаються без часу, тому кінець періоду включає весь останній день.
+    first_full = None
+    if start_date is not None:
+        first_full = month_start(start_date)
+        if start_date.date() != first_full:
+            first_full = next_month(first_full)
+
+    last_full = None
+    if end_date is not None:
+        last_full = month_start(end_date)
+        if next_month(last_full) - timedelta(days=1) != end_date.date():
+            last_full = month_start(last_full - timedelta(days=1))
+
+    if first_full is not None and last_full is not None and first_full > last_full:
+        return None, None
+    return first_full, last_full
+
+
+ROLLUP_SQL = (
+    "SELECT user_id, {month} AS month, sum(uah) AS uah_total, "
+    "coalesce(sum(usd), 0) AS usd_total, count(*) AS count "
+    "FROM expenses WHERE user_id IS NOT NULL AND date IS NOT NULL {where} GROUP BY 1, 2"
+)
+MONTH_SQL = {
+    "postgresql": "date_trunc('month', date)::date",
+    # Локальна база і тести
+    "sqlite": "date(date, 'start of month')",
+}
+
+
+def rollup_sql(dialect: str, where: str = ""):
+    return ROLLUP_SQL.format(month=MONTH_SQL[dialect], where=where)
+
+
+def rebuild(user_id: int = None):
+    where = "AND user_id = :user_id" if user_id is not None else ""
+    params = {"user_id": user_id}
+
+    with SessionLocal() as db:
+        db.execute(
+            text("DELETE FROM expense_rollups" + (" WHERE user_id = :user_id" if user_id is not None else "")),
+            params
+        )
+        db.execute(text(
+            "INSERT INTO expense_rollups (user_id, month, uah_total, usd_total, count) "
+            + rollup_sql(db.bind.dialect.name, where)
+        ), params)
+        db.commit()
+
+
+def check(user_id: int = None, tolerance: float = 0.01):
+    where = "AND user_id = :user_id" if user_id is not None else ""
+    rollup_where = "WHERE user_id = :user_id" if user_id is not None else ""
+
+    with SessionLocal() as db:
+        rows = db.execute(text(
+            f"WITH actual AS ({rollup_sql(db.bind.dialect.name, where)}), "
+            f"stored AS (SELECT * FROM expense_rollups {rollup_where}) "
+            "SELECT coalesce(a.user_id, s.user_id) AS user_id, coalesce(a.month, s.month) AS month, "
+            "a.uah_total AS actual_uah, s.uah_total AS stored_uah, a.usd_total AS actual_usd, "
+            "s.usd_total AS stored_usd, a.count AS actual_count, s.count AS stored_count "
+            "FROM actual a FULL OUTER JOIN stored s ON a.user_id = s.user_id AND a.month = s.month "
+            "WHERE coalesce(a.count, 0) <> coalesce(s.count, 0) "
+            "OR abs(coalesce(a.uah_total, 0) - coalesce(s.uah_total, 0)) > :tolerance "
+            "OR abs(coalesce(a.usd_total, 0) - coalesce(s.usd_total, 0)) > :tolerance "
+            "ORDER BY 1, 2"
+        ), {"user_id": user_id, "tolerance": tolerance}).all()
+
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Місячні підсумки витрат (expense_rollups)")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--user-id", type=int)
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        rebuild(args.user_id)
+        print("Підсумки перераховано")
+    else:
+        mismatches = check(args.user_id)
+        for row in mismatches:
+            print(
+                f"user_id={row.user_id} місяць={row.month}: "
+                f"грн {row.actual_uah} != {row.stored_uah}, USD {row.actual_usd} != {row.stored_usd}, "
+                f"кількість {row.actual_count} != {row.stored_count}"
+            )
+        print(f"Розбіжностей: {len(mismatches)}")
+        sys.exit(1 if mismatches else 0)
@@ -1,149 +1,386 @@
-from sqlalchemy.orm import Session
-from datetime import datetime
-from models import User, Expense
-from io import BytesIO
-from sqlalchemy import func
-import pandas as pd
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, time, timedelta
+from models import User, Expense, ExpenseRollup
+from sqlalchemy import select, insert, update, delete, literal, tuple_, func, or_, and_, true
+from sqlalchemy.exc import IntegrityError
+import asyncio
+from time import perf_counter
 
-from parse_exchange_rate import usd_exchange_rate
+from bot.config import EXPENSE_PAGE_SIZE, IMPORT_CHUNK_SIZE
+from database import dialect_insert
+from jobs import report_jobs, QueueFull, SingleFlight
+from metrics import REPORT_BYTES, REPORT_SECONDS
+from report_cache import report_cache, EMPTY
+from report_writer import export_report, ReportFile
+from stats import stats_job
+from rollups import add_delta, apply_rollup_deltas, split_range, next_month as rollups_next_month
+from user_cache import user_ids
 
 
-def create_user(db: Session, telegram_id: int, username: str):
-    db_user = db.query(User).filter(User.telegram_id == telegram_id).first()
-    if db_user is None:
-        new_user = User(telegram_id=telegram_id, username=username)
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
-        return new_user
-    return db_user
+def user_id_clause(telegram_id: int):
+    # Якщо id відомий - підставляємо його, інакше підзапит у тому ж самому запиті
+    user_id = user_ids.get(telegram_id)
+    if user_id is not None:
+        return Expense.user_id == user_id
+    return Expense.user_id == select(User.id).where(User.telegram_id == telegram_id).scalar_subquery()
 
 
-def post_expense(db: Session, telegram_id: int, data: dict):
-    db_user = db.query(User).filter(User.telegram_id == telegram_id).first()
+async def resolve_user_id(db: AsyncSession, telegram_id: int):
+    user_id = user_ids.get(telegram_id)
+    if user_id is None:
+        user_id = await db.scalar(select(User.id).where(User.telegram_id == telegram_id))
+        if user_id is not None:
+            user_ids.set(telegram_id, user_id)
+    return user_id
 
-    if not db_user:
+
+def is_foreign_key_violation(error: IntegrityError):
+    # 23503 - foreign_key_violation (asyncpg: sqlstate, psycopg2: pgcode); SQLite повідомляє лише текстом
+    code = getattr(error.orig, "sqlstate", None) or getattr(error.orig, "pgcode", None)
+    return code == "23503" or "FOREIGN KEY" in str(error.orig)
+
+
+async def bump_data_version(db: AsyncSession, user_id: int):
+    # Версія в БД і в тій самій транзакції, що й запис: однакова для всіх процесів
+    await db.execute(update(User).where(User.id == user_id).values(data_version=User.data_version + 1))
+
+
+async def get_data_version(db: AsyncSession, telegram_id: int):
+    return await db.scalar(select(User.data_version).where(User.telegram_id == telegram_id)) or 0
+
+
+def forget_user(telegram_id: int = None):
+    user_ids.invalidate(telegram_id)
+
+
+async def create_user(db: AsyncSession, telegram_id: int, username: str):
+    stmt = dialect_insert(db, User).values(telegram_id=telegram_id, username=username)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.telegram_id],
+        set_={"username": stmt.excluded.username}
+    ).returning(User.id, User.telegram_id, User.username)
+
+    user = (await db.execute(stmt)).one()
+    await db.commit()
+
+    user_ids.set(telegram_id, user.id)
+    return user
+
+
+async def post_expense(db: AsyncSession, telegram_id: int, data: dict):
+    values = {
+        "name": data['name'],
+        "date": datetime.strptime(data['date'], "%d.%m.%Y"),
+        "uah": float(data['amount']),
+        "usd": data.get('amount_usd'),
+        "created_at": datetime.utcnow(),
+    }
+
+    user_id = user_ids.get(telegram_id)
+    if user_id is not None:
+        stmt = insert(Expense.__table__).values(user_id=user_id, **values)
+    else:
+        # INSERT ... SELECT: користувач і вставка - за один запит
+        columns = Expense.__table__.c
+        stmt = insert(Expense.__table__).from_select(
+            ["user_id", *values],
+            select(User.id, *(literal(value, columns[key].type) for key, value in values.items()))
+            .where(User.telegram_id == telegram_id)
+        )
+
+    try:
+        inserted = (await db.execute(stmt.returning(Expense.__table__.c.user_id))).first()
+    except IntegrityError as e:
+        await db.rollback()
+        # Застарілий users.id у кеші; інші порушення обмежень - справжні помилки
+        if not is_foreign_key_violation(e):
+            raise
+        forget_user(telegram_id)
         return "User не знайдено"
 
-    new_expense = Expense(
-        user_id=db_user.id,
-        name=data['name'],
-        date=data['date'],
-        uah=float(data['amount']),
-        usd=data.get('amount_usd'),
+    if inserted is None:
+        return "User не знайдено"
+
+    await apply_rollup_deltas(
+        db, add_delta({}, inserted.user_id, values["date"], values["uah"], values["usd"], 1)
     )
+    await bump_data_version(db, inserted.user_id)
+    await db.commit()
+
 
-    db.add(new_expense)
-    db.commit()
+def expense_deltas(user_id: int, expenses: list):
+    deltas = {}
+    for values in expenses:
+        add_delta(deltas, user_id, values["date"], values["uah"], values["usd"], 1)
+    return deltas
 
 
-def get_expenses(db: Session, telegram_id: int, start_date_str: str, end_date_str: str):
-    db_user = db.query(User).filter(User.telegram_id == telegram_id).first()
-    if not db_user:
+async def post_expenses(db: AsyncSession, telegram_id: int, expenses: list):
+    user_id = await resolve_user_id(db, telegram_id)
+    if user_id is None:
         return "User не знайдено"
 
-    try:
-        start_date = datetime.strptime(start_date_str, "%d.%m.%Y")
-        end_date = datetime.strptime(end_date_str, "%d.%m.%Y")
-    except ValueError:
-        return "Невірний формат дат. Використовуйте формат dd.mm.YYYY."
+    created_at = datetime.utcnow()
+    # Усі витрати одним multi-row INSERT і одним комітом
+    result = await db.execute(
+        insert(Expense.__table__)
+        .values([{"user_id": user_id, "created_at": created_at, **values} for values in expenses])
+        .returning(Expense.__table__.c.id)
+    )
+    expense_ids = result.scalars().all()
+    await apply_rollup_deltas(db, expense_deltas(user_id, expenses))
+    await bump_data_version(db, user_id)
+    await db.commit()
 
-    expenses = db.query(Expense).filter(
-        Expense.user_id == db_user.id,
-        Expense.date >= start_date,
-        Expense.date <= end_date
-    ).all()
+    return expense_ids
 
-    if not expenses:
-        return "Витрати за вказаний період не знайдено."
 
-    total_amount_uah = db.query(func.sum(Expense.uah)).filter(
-        Expense.user_id == db_user.id,
-        Expense.date >= start_date,
-        Expense.date <= end_date
-    ).scalar() or 0
+async def post_expenses_bulk(db: AsyncSession, telegram_id: int, expenses: list, chunk_size: int = IMPORT_CHUNK_SIZE):
+    user_id = await resolve_user_id(db, telegram_id)
+    if user_id is None:
+        return "User не знайдено"
 
-    total_amount_usd = db.query(func.sum(Expense.usd)).filter(
-        Expense.user_id == db_user.id,
-        Expense.date >= start_date,
-        Expense.date <= end_date
-    ).scalar() or 0
+    created_at = datetime.utcnow()
+    # Одна транзакція; всередині - пакетні вставки (executemany) по chunk_size рядків
+    for i in range(0, len(expenses), chunk_size):
+        chunk = [{"user_id": user_id, "created_at": created_at, **values} for values in expenses[i:i + chunk_size]]
+        await db.execute(insert(Expense.__table__), chunk)
 
-    data = [{
-        "ID": exp.id,
-        "Назва": exp.name,
-        "Дата": exp.date.strftime('%d.%m.%Y'),
-        "Сума (грн)": exp.uah,
-        "Сума (USD)": exp.usd if exp.usd else "None"
-    } for exp in expenses]
+    await apply_rollup_deltas(db, expense_deltas(user_id, expenses))
+    if expenses:
+        await bump_data_version(db, user_id)
+    await db.commit()
 
-    df = pd.DataFrame(data)
+    return len(expenses)
 
-    df.loc[len(df)] = ["", "Загальна сума витрат (грн)", "", total_amount_uah, ""]
-    df.loc[len(df)] = ["", "Загальна сума витрат (USD)", "", "", total_amount_usd]
 
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="Звіт витрат")
-    output.seek(0)
+REPORT_COLUMNS = (Expense.id, Expense.name, Expense.date, Expense.uah, Expense.usd)
+report_flights = SingleFlight()
 
-    return output
 
+async def render_report(db: AsyncSession, telegram_id: int, user_id: int, start_date=None, end_date=None):
+    # Звіт перераховується лише якщо дані користувача змінилися
+    key = (telegram_id, start_date, end_date, await get_data_version(db, telegram_id))
+    # Звіт формується в окремому процесі зі своїм з'єднанням: з'єднання сесії повертається в пул
+    await db.commit()
 
-def get_expenses_all(db: Session, telegram_id: int):
-    db_user = db.query(User).filter(User.telegram_id == telegram_id).first()
-    if not db_user:
+    file_id = report_cache.get_file_id(key)
+    if file_id is not None:
+        return ReportFile(None, None, 0, key, file_id)
+
+    report = report_cache.get(key)
+    if report is not None:
+        return None if report is EMPTY else report
+
+    # Повторні натискання, поки звіт ще формується, чекають той самий результат
+    report, shared = await report_flights.do(key, build_report, key, user_id, start_date, end_date)
+    if shared and isinstance(report, ReportFile):
+        report = report.share()
+    return report
+
+
+async def build_report(key, user_id: int, start_date, end_date):
+    started = perf_counter()
+    try:
+        report = await report_jobs.submit(key[0], export_report, user_id, start_date, end_date)
+    except QueueFull:
+        return "Зараз формується забагато звітів. Спробуйте, будь ласка, трохи пізніше."
+    except asyncio.TimeoutError:
+        return "Не вдалося сформувати звіт вчасно. Спробуйте менший період."
+
+    finally:
+        REPORT_SECONDS.observe(perf_counter() - started)
+
+    if report is None:
+        report_cache.put(key, EMPTY)
+        return None
+
+    REPORT_BYTES.observe(report.size)
+    report = report._replace(key=key)
+    report_cache.put(key, report)
+    return report
+
+
+def report_query(user_id: int, start_date: datetime = None, end_date: datetime = None):
+    stmt = select(*REPORT_COLUMNS).where(Expense.user_id == user_id)
+    if start_date is not None:
+        stmt = stmt.where(Expense.date >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(Expense.date <= end_date)
+    # Порядок збігається з ключем індексу ix_expenses_user_id_date_id, окреме сортування не потрібне
+    return stmt.order_by(Expense.date, Expense.id)
+
+
+async def get_expenses(db: AsyncSession, telegram_id: int, start_date_str: str, end_date_str: str):
+    user_id = await resolve_user_id(db, telegram_id)
+    if user_id is None:
         return "User не знайдено"
 
-    expenses = db.query(Expense).filter(Expense.user_id == db_user.id).all()
-    if not expenses:
-        return "У вас поки немає витрат."
+    try:
+        start_date = datetime.strptime(start_date_str, "%d.%m.%Y")
+        end_date = datetime.strptime(end_date_str, "%d.%m.%Y")
+    except ValueError:
+        return "Невірний формат дат. Використовуйте формат dd.mm.YYYY."
 
-    total_amount_uah = db.query(func.sum(Expense.uah)).filter(Expense.user_id == db_user.id).scalar() or 0
-    total_amount_usd = db.query(func.sum(Expense.usd)).filter(Expense.user_id == db_user.id).scalar() or 0
+    report = await render_report(db, telegram_id, user_id, start_date, end_date)
+    if report is None:
+        return "Витрати за вказаний період не знайдено."
 
-    data = [{
-        "ID": exp.id,
-        "Назва": exp.name,
-        "Дата": exp.date.strftime('%d.%m.%Y'),
-        "Сума (грн)": exp.uah,
-        "Сума (USD)": exp.usd if exp.usd else "None"
-    } for exp in expenses]
+    return report
 
-    df = pd.DataFrame(data)
 
-    df.loc[len(df)] = ["", "Загальна сума витрат (грн)", "", total_amount_uah, ""]
-    df.loc[len(df)] = ["", "Загальна сума витрат (USD)", "", "", total_amount_usd]
+async def get_expenses_all(db: AsyncSession, telegram_id: int):
+    user_id = await resolve_user_id(db, telegram_id)
+    if user_id is None:
+        return "User не знайдено"
 
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine="xlsxwriter") as writer:
-        df.to_excel(writer, index=False, sheet_name="Звіт витрат")
-    output.seek(0)
+    report = await render_report(db, telegram_id, user_id)
+    if report is None:
+        return "У вас поки немає витрат."
 
-    return output
+    return report
 
 
-def delete_expense(db: Session, telegram_id: int, expense_id: int):
-    db_user = db.query(User).filter(User.telegram_id == telegram_id).first()
-    if not db_user:
-        return False
+async def get_expense_stats(db: AsyncSession, telegram_id: int):
+    user_id = await resolve_user_id(db, telegram_id)
+    if user_id is None:
+        return "User не знайдено"
 
-    expense_to_delete = db.query(Expense).filter(Expense.id == expense_id, Expense.user_id == db_user.id).first()
+    key = ("stats", telegram_id, await get_data_version(db, telegram_id))
+    await db.commit()
+    try:
+        stats, _ = await report_flights.do(key, report_jobs.submit, telegram_id, stats_job, user_id)
+    except QueueFull:
+        return "Зараз формується забагато звітів. Спробуйте, будь ласка, трохи пізніше."
+    except asyncio.TimeoutError:
+        return "Не вдалося порахувати статистику вчасно. Спробуйте пізніше."
 
-    if not expense_to_delete:
+    if stats is None:
+        return "У вас поки немає витрат."
+    return stats
+
+
+def encode_cursor(row):
+    return f"{row.date:%Y%m%d%H%M%S}-{row.id}"
+
+
+def decode_cursor(cursor: str):
+    date_str, expense_id = cursor.split("-")
+    return datetime.strptime(date_str, "%Y%m%d%H%M%S"), int(expense_id)
+
+
+async def get_expense_page(db: AsyncSession, telegram_id: int, direction: str = "first", cursor: tuple = None,
+                           month_end: datetime = None, limit: int = EXPENSE_PAGE_SIZE, start_date: datetime = None,
+                           end_date: datetime = None):
+    # Keyset-пагінація по (date, id): кожна сторінка читає лише limit + 1 рядків
+    key = tuple_(Expense.date, Expense.id)
+    stmt = select(*REPORT_COLUMNS).where(user_id_clause(telegram_id))
+    if start_date is not None:
+        stmt = stmt.where(Expense.date >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(Expense.date <= end_date)
+
+    if direction == "older":
+        stmt = stmt.where(key < tuple_(*cursor))
+    elif direction == "newer":
+        stmt = stmt.where(key > tuple_(*cursor))
+    elif direction == "month":
+        stmt = stmt.where(Expense.date < month_end)
+
+    if direction == "newer":
+        stmt = stmt.order_by(Expense.date, Expense.id)
+    else:
+        stmt = stmt.order_by(Expense.date.desc(), Expense.id.desc())
+
+    rows = (await db.execute(stmt.limit(limit + 1))).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if direction == "newer":
+        rows.reverse()
+        return rows, True, has_more
+
+    return rows, has_more, direction != "first"
+
+
+def date_filters(start_date: datetime = None, end_date: datetime = None):
+    filters = []
+    if start_date is not None:
+        filters.append(Expense.date >= start_date)
+    if end_date is not None:
+        filters.append(Expense.date <= end_date)
+    return filters
+
+
+async def get_expense_totals(db: AsyncSession, telegram_id: int, start_date: datetime = None,
+                             end_date: datetime = None):
+    user_id = await resolve_user_id(db, telegram_id)
+    if user_id is None:
+        return {"count": 0, "uah": 0, "usd": 0}
+
+    raw = select(
+        func.count(Expense.id), func.coalesce(func.sum(Expense.uah), 0), func.coalesce(func.sum(Expense.usd), 0)
+    ).where(Expense.user_id == user_id, *date_filters(start_date, end_date))
+
+    first_full, last_full = split_range(start_date, end_date)
+    full_months = (start_date is None or first_full is not None) and (end_date is None or last_full is not None)
+    if not full_months:
+        count, total_uah, total_usd = (await db.execute(raw)).one()
+        return {"count": count, "uah": total_uah, "usd": total_usd}
+
+    # Повні місяці - з rollups, сирі рядки - лише для неповних крайових місяців
+    rollup = select(
+        func.coalesce(func.sum(ExpenseRollup.count), 0),
+        func.coalesce(func.sum(ExpenseRollup.uah_total), 0),
+        func.coalesce(func.sum(ExpenseRollup.usd_total), 0)
+    ).where(ExpenseRollup.user_id == user_id)
+    edges = []
+    if first_full is not None:
+        rollup = rollup.where(ExpenseRollup.month >= first_full)
+        edges.append(Expense.date < datetime.combine(first_full, time()))
+    if last_full is not None:
+        rollup = rollup.where(ExpenseRollup.month <= last_full)
+        edges.append(Expense.date >= datetime.combine(rollups_next_month(last_full), time()))
+
+    count, total_uah, total_usd = (await db.execute(rollup)).one()
+    if edges:
+        edge_count, edge_uah, edge_usd = (await db.execute(raw.where(or_(*edges)))).one()
+        count, total_uah, total_usd = count + edge_count, total_uah + edge_uah, total_usd + edge_usd
+
+    return {"count": count, "uah": total_uah, "usd": total_usd}
+
+
+def expense_day_clause(expense_date=None):
+    # Відома дата витрати обмежує пошук за id однією секцією замість усіх
+    if expense_date is None:
+        return true()
+    day = datetime(expense_date.year, expense_date.month, expense_date.day)
+    return and_(Expense.date >= day, Expense.date < day + timedelta(days=1))
+
+
+async def delete_expense(db: AsyncSession, telegram_id: int, expense_id: int, expense_date=None):
+    table = Expense.__table__
+    deleted = (await db.execute(
+        delete(table)
+        .where(table.c.id == expense_id, user_id_clause(telegram_id), expense_day_clause(expense_date))
+        .returning(table.c.user_id, table.c.date, table.c.uah, table.c.usd)
+    )).first()
+
+    if deleted is None:
         return False
-    db.delete(expense_to_delete)
-    db.commit()
+    await apply_rollup_deltas(db, add_delta({}, deleted.user_id, deleted.date, -deleted.uah, -(deleted.usd or 0), -1))
+    await bump_data_version(db, deleted.user_id)
+    await db.commit()
 
     return True
 
 
-def get_expense_by_id(db: Session, telegram_id: int, expense_id: int):
-    db_user = db.query(User).filter(User.telegram_id == telegram_id).first()
-    if not db_user:
-        return "User не знайдено"
-
-    expense = db.query(Expense).filter(Expense.id == expense_id, Expense.user_id == db_user.id).first()
+async def get_expense_by_id(db: AsyncSession, telegram_id: int, expense_id: int, expense_date=None):
+    result = await db.execute(
+        select(*REPORT_COLUMNS)
+        .where(Expense.id == expense_id, user_id_clause(telegram_id), expense_day_clause(expense_date))
+    )
+    expense = result.one_or_none()
     if not expense:
         return "Витрата не знайдена"
 
@@ -156,21 +393,29 @@ def get_expense_by_id(db: Session, telegram_id: int, expense_id: int):
     }
 
 
-def update_expense(db: Session, telegram_id: int, expense_id: int, new_name: str, new_amount: float):
-    db_user = db.query(User).filter(User.telegram_id == telegram_id).first()
-    if not db_user:
-        return "User не знайдено"
-
-    expense = db.query(Expense).filter(Expense.id == expense_id, Expense.user_id == db_user.id).first()
-    if not expense:
+async def update_expense(db: AsyncSession, telegram_id: int, expense_id: int, new_name: str, new_amount: float,
+                         usd_rate: float = None, expense_date=None):
+    table = Expense.__table__
+    new_usd = round(new_amount / usd_rate, 2) if usd_rate else None
+    # Старі суми потрібні для різниці в місячних підсумках; рядок заблокований до коміту
+    current = (await db.execute(
+        select(table.c.id, table.c.user_id, table.c.date, table.c.uah, table.c.usd)
+        .where(table.c.id == expense_id, user_id_clause(telegram_id), expense_day_clause(expense_date))
+        .with_for_update()
+    )).first()
+    if current is None:
         return "Витрата не знайдена"
 
-    expense.name = new_name
-    expense.uah = new_amount
-
-    usd_rate = usd_exchange_rate()
-    expense.usd = round(new_amount / usd_rate, 2) if usd_rate else None
-
-    db.commit()
+    # Дата з прочитаного рядка - ключ секціонування: UPDATE зачіпає лише одну секцію
+    await db.execute(
+        update(table)
+        .where(table.c.id == current.id, table.c.date == current.date)
+        .values(name=new_name, uah=new_amount, usd=new_usd)
+    )
+    await apply_rollup_deltas(db, add_delta(
+        {}, current.user_id, current.date, new_amount - current.uah, (new_usd or 0) - (current.usd or 0), 0
+    ))
+    await bump_data_version(db, current.user_id)
+    await db.commit()
 
     return "Витрата успішно оновлена"
@@ -1,20 +1,21 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 import datetime
-from typing import Optional
+from typing import List, Optional
+
+from expense_import import is_plausible_date
 
 
 class UserBase(BaseModel):
     telegram_id: int
     username: Optional[str] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ExpenseBase(BaseModel):
     name: str
     uah: float
-    usd: float
+    usd: Optional[float] = None
 
 
 class ExpenseResponse(ExpenseBase):
@@ -22,5 +23,43 @@ class ExpenseResponse(ExpenseBase):
     user_id: int
     created_at: datetime.datetime
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ExpenseOut(BaseModel):
+    id: int
+    name: str
+    date: datetime.datetime
+    uah: float
+    usd: Optional[float] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ExpensePageOut(BaseModel):
+    items: List[ExpenseOut]
+    next_cursor: Optional[str] = None
+
+
+class ExpenseCreate(BaseModel):
+    name: str = Field(min_length=1)
+    date: datetime.date
+    uah: float = Field(gt=0)
+
+    @field_validator("date")
+    @classmethod
+    def check_date(cls, value: datetime.date):
+        if not is_plausible_date(value):
+            raise ValueError("неправдоподібна дата")
+        return value
+
+
+class ExpenseUpdate(BaseModel):
+    name: str = Field(min_length=1)
+    uah: float = Field(gt=0)
+
+
+class ExpenseSummary(BaseModel):
+    count: int
+    uah: float
+    usd: float
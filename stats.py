@@ -0,0 +1,135 @@
+import logging
+import time
+from datetime import date
+
+from sqlalchemy import func, select, text
+
+from bot.config import STATS_LATENCY_BUDGET_MS, STATS_MONTHS, STATS_TOP_NAMES
+from models import Expense
+
+EPOCH = date(1970, 1, 1)
+
+# Postgres віддає кожну колонку одним масивом: без ORM-об'єктів і кортежів на кожен рядок
+PG_COLUMNS_SQL = (
+    "SELECT array_agg(date::date - DATE '1970-01-01'), array_agg(uah), array_agg(coalesce(usd, 0)), "
+    "array_agg(name) FROM expenses WHERE user_id = :user_id"
+)
+
+
+def load_columns(db, user_id: int):
+    import numpy as np
+
+    if db.bind.dialect.name == "postgresql":
+        days, uah, usd, names = (column or [] for column in db.execute(text(PG_COLUMNS_SQL), {"user_id": user_id}).one())
+        days = np.array(days, dtype=np.int64)
+    else:
+        rows = db.execute(
+            select(Expense.date, Expense.uah, func.coalesce(Expense.usd, 0), Expense.name)
+            .where(Expense.user_id == user_id)
+        ).all()
+        dates, uah, usd, names = zip(*rows) if rows else ([], [], [], [])
+        days = np.array(dates, dtype="datetime64[D]").astype(np.int64)
+
+    return days, np.array(uah, dtype=np.float64), np.array(usd, dtype=np.float64), np.array(names, dtype=object)
+
+
+def compute_stats(days, uah, usd, names, today: int, months: int = STATS_MONTHS, top: int = STATS_TOP_NAMES):
+    import numpy as np
+    import pandas as pd
+
+    if len(days) == 0:
+        return None
+
+    # Номер місяця від 1970-01 для кожної витрати
+    month_index = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    current_month = int(np.datetime64(today, "D").astype("datetime64[M]").astype(np.int64))
+    # Зайвий місяць на початку потрібен для різниці з першим показаним місяцем
+    first_month = current_month - months
+
+    in_window = (month_index >= first_month) & (month_index <= current_month)
+    offsets = month_index[in_window] - first_month
+    monthly_uah = np.bincount(offsets, weights=uah[in_window], minlength=months + 1)
+    monthly_usd = np.bincount(offsets, weights=usd[in_window], minlength=months + 1)
+    monthly_count = np.bincount(offsets, minlength=months + 1)
+    deltas = np.diff(monthly_uah)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta_pct = np.where(monthly_uah[:-1] > 0, deltas / monthly_uah[:-1] * 100, np.nan)
+
+    codes, unique_names = pd.factorize(names[in_window])
+    name_totals = np.bincount(codes, weights=uah[in_window], minlength=len(unique_names))
+    name_counts = np.bincount(codes, minlength=len(unique_names))
+    top_codes = np.argsort(name_totals)[::-1][:top]
+
+    # Ковзне середнє за 30 днів: денні суми за 60 днів і різниця кумулятивних сум
+    window_start = today - 59
+    recent = (days >= window_start) & (days <= today)
+    daily = np.bincount(days[recent] - window_start, weights=uah[recent], minlength=60)
+    cumulative = np.concatenate(([0.0], np.cumsum(daily)))
+    rolling = (cumulative[30:] - cumulative[:-30]) / 30
+
+    return {
+        "count": int(len(days)),
+        "total_uah": round(float(uah.sum()), 2),
+        "total_usd": round(float(usd.sum()), 2),
+        "rolling_30d_avg_uah": round(float(rolling[-1]), 2),
+        "previous_30d_avg_uah": round(float(rolling[0]), 2),
+        "months": [
+            {
+                "month": str(np.datetime64(first_month + i, "M")),
+                "uah": round(float(monthly_uah[i]), 2),
+                "usd": round(float(monthly_usd[i]), 2),
+                "count": int(monthly_count[i]),
+                "delta_uah": round(float(deltas[i - 1]), 2),
+                "delta_pct": None if np.isnan(delta_pct[i - 1]) else round(float(delta_pct[i - 1]), 1),
+            }
+            for i in range(1, months + 1)
+        ],
+        "top_names": [
+            {"name": str(unique_names[code]), "uah": round(float(name_totals[code]), 2), "count": int(name_counts[code])}
+            for code in top_codes if name_totals[code] > 0
+        ],
+    }
+
+
+def stats_job(user_id: int):
+    # Виконується в процесі з пулу звітів
+    from database import SessionLocal
+
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        columns = load_columns(db, user_id)
+    fetched = time.perf_counter()
+
+    stats = compute_stats(*columns, today=(date.today() - EPOCH).days)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    if elapsed_ms > STATS_LATENCY_BUDGET_MS:
+        logging.warning(
+            f"Статистика для user_id={user_id} зайняла {elapsed_ms:.0f} мс "
+            f"(вибірка {(fetched - started) * 1000:.0f} мс), бюджет {STATS_LATENCY_BUDGET_MS} мс"
+        )
+    if stats is not None:
+        stats["elapsed_ms"] = round(elapsed_ms, 1)
+    return stats
+
+
+def format_stats(stats: dict):
+    lines = [
+        "Статистика витрат",
+        "",
+        f"Всього: {stats['count']} витрат, {stats['total_uah']:g} грн ({stats['total_usd']:g} USD)",
+        f"Середньо за день (30 днів): {stats['rolling_30d_avg_uah']:g} грн "
+        f"(попередні 30 днів: {stats['previous_30d_avg_uah']:g} грн)",
+        "",
+        "По місяцях:",
+    ]
+    for month in stats["months"]:
+        delta = f" ({month['delta_pct']:+g}%)" if month["delta_pct"] is not None else ""
+        year, month_number = month["month"].split("-")
+        lines.append(f"{month_number}.{year}: {month['uah']:g} грн{delta}")
+
+    if stats["top_names"]:
+        lines += ["", f"Найбільші статті за {len(stats['months'])} міс.:"]
+        lines += [f"{item['name']}: {item['uah']:g} грн ({item['count']})" for item in stats["top_names"]]
+
+    return "\n".join(lines)
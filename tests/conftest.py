@@ -0,0 +1,22 @@
+import os
+import tempfile
+
+import pytest
+
+# database.py читає адресу при імпорті, тому тимчасова SQLite задається до імпорту модулів застосунку
+DB_PATH = os.path.join(tempfile.mkdtemp(), "expenses.sqlite3")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+
+
+@pytest.fixture
+def expense_tables():
+    from database import Base, engine
+    from models import User, Expense, ExpenseRollup
+    from user_cache import user_ids
+
+    tables = [User.__table__, Expense.__table__, ExpenseRollup.__table__]
+    Base.metadata.create_all(engine, tables=tables)
+    yield
+    Base.metadata.drop_all(engine, tables=tables)
+    user_ids.invalidate()
@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import pytest
+
+from expense_import import parse_expense_file, ImportFileError
+
+
+@pytest.mark.parametrize("content, encoding, rows, error_lines", [
+    (
+        "Назва;Дата;Сума (грн)\nХліб;01.02.2025;30\nМолоко;2025-02-02;45,5\n",
+        "utf-8",
+        [(datetime(2025, 2, 1), "Хліб", 30.0), (datetime(2025, 2, 2), "Молоко", 45.5)],
+        [],
+    ),
+    (
+        "﻿Name,Date,Amount\nBread,03/02/2025,30\n",
+        "utf-8",
+        [(datetime(2025, 2, 3), "Bread", 30.0)],
+        [],
+    ),
+    # Без заголовка: дата, назва, сума
+    ("01.02.2025,Хліб,30\n02.02.2025,Молоко,45\n", "utf-8", [
+        (datetime(2025, 2, 1), "Хліб", 30.0), (datetime(2025, 2, 2), "Молоко", 45.0)
+    ], []),
+    ("Назва;Дата;Сума\nХліб;01.02.2025;30\n", "cp1251", [(datetime(2025, 2, 1), "Хліб", 30.0)], []),
+    # Підсумки з нашого ж звіту пропускаються
+    (
+        "ID;Назва;Дата;Сума (грн);Сума (USD)\n1;Хліб;01.02.2025;30;0.73\n;Загальна сума витрат (грн);;30;\n",
+        "utf-8",
+        [(datetime(2025, 2, 1), "Хліб", 30.0)],
+        [],
+    ),
+    (
+        "Назва;Дата;Сума\n;01.02.2025;30\nХліб;;30\nХліб;01.02.2025;abc\nХліб;01.02.2025;-5\nХліб;01.02.1900;5\nХліб;01.02.2025\n",
+        "utf-8",
+        [],
+        [2, 3, 4, 5, 6, 7],
+    ),
+])
+def test_parse_csv(tmp_path, content, encoding, rows, error_lines):
+    path = tmp_path / "expenses.csv"
+    path.write_bytes(content.encode(encoding))
+
+    parsed, errors = parse_expense_file(str(path), "expenses.csv", max_rows=100)
+    assert parsed == rows
+    assert [line_no for line_no, _ in errors] == error_lines
+
+
+def test_parse_csv_row_limit(tmp_path):
+    path = tmp_path / "expenses.csv"
+    path.write_text("Назва;Дата;Сума\n" + "Хліб;01.02.2025;30\n" * 5, encoding="utf-8")
+
+    rows, errors = parse_expense_file(str(path), "expenses.csv", max_rows=3)
+    assert len(rows) == 3
+    assert [line_no for line_no, _ in errors] == [5]
+
+
+def test_parse_xlsx(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    path = tmp_path / "expenses.xlsx"
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["Назва", "Дата", "Сума (грн)"])
+    sheet.append(["Хліб", datetime(2025, 2, 1, 13, 30), 30])
+    sheet.append(["Молоко", "02.02.2025", "45,5"])
+    sheet.append([None, None, None])
+    sheet.append(["Кава", "вчора", 60])
+    workbook.save(path)
+
+    rows, errors = parse_expense_file(str(path), "expenses.XLSX", max_rows=100)
+    assert rows == [(datetime(2025, 2, 1), "Хліб", 30.0), (datetime(2025, 2, 2), "Молоко", 45.5)]
+    assert [line_no for line_no, _ in errors] == [5]
+
+
+@pytest.mark.parametrize("filename, content", [
+    ("expenses.xlsx", "Назва;Дата;Сума\n".encode("utf-8")),
+    ("expenses.csv", b"\x98\x98;01.02.2025;30\n"),
+])
+def test_unreadable_file(tmp_path, filename, content):
+    pytest.importorskip("openpyxl")
+    path = tmp_path / filename
+    path.write_bytes(content)
+
+    with pytest.raises(ImportFileError):
+        parse_expense_file(str(path), filename, max_rows=100)
@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import create_engine, select, text, func, Table, Column, Integer, MetaData
+
+from profiling import SlowQueryLog
+
+metadata = MetaData()
+items = Table("items", metadata, Column("id", Integer, primary_key=True))
+
+
+@pytest.fixture
+def explained(monkeypatch):
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    log = SlowQueryLog(explain_engine=engine, threshold_ms=0, explain=True, explain_interval=0)
+    submitted = []
+    monkeypatch.setattr(log, "_submit_explain", lambda element, params, statement: submitted.append(statement))
+    log.install(engine)
+    with engine.connect() as conn:
+        yield conn, submitted
+    engine.dispose()
+
+
+@pytest.mark.parametrize("statement, expected", [
+    (select(items.c.id), True),
+    (select(func.count(items.c.id)), True),
+    (select(func.abs(-1)), False),
+    (text("SELECT id FROM items"), False),
+])
+def test_only_table_selects_are_explained(explained, statement, expected):
+    conn, submitted = explained
+    conn.execute(statement)
+    assert bool(submitted) is expected
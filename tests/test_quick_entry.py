@@ -0,0 +1,35 @@
+from datetime import datetime
+
+import pytest
+
+from expense_import import parse_quick_entry
+
+
+@pytest.mark.parametrize("text, rows, error_lines", [
+    ("19.03.2025 Продукти 550", [(datetime(2025, 3, 19), "Продукти", 550.0)], []),
+    ("19.03.2025 Кава з собою 45,50 грн", [(datetime(2025, 3, 19), "Кава з собою", 45.5)], []),
+    ("19.03.2025 Таксі 120.25грн", [(datetime(2025, 3, 19), "Таксі", 120.25)], []),
+    (
+        "01.01.2025 Хліб 30\n\n02.01.2025 Молоко 45",
+        [(datetime(2025, 1, 1), "Хліб", 30.0), (datetime(2025, 1, 2), "Молоко", 45.0)],
+        [],
+    ),
+    ("Продукти 550", [], [1]),
+    ("19.03.2025 Продукти", [], [1]),
+    ("19.03.2025 Продукти 0", [], [1]),
+    ("31.02.2025 Продукти 10", [], [1]),
+    ("19.03.1999 Продукти 10", [], [1]),
+    ("19.03.2025 Продукти 10\n\nпомилка\n20.03.2025 Кава 60", [
+        (datetime(2025, 3, 19), "Продукти", 10.0), (datetime(2025, 3, 20), "Кава", 60.0)
+    ], [3]),
+])
+def test_parse_quick_entry(text, rows, error_lines):
+    parsed, errors = parse_quick_entry(text, max_lines=10)
+    assert parsed == rows
+    assert [line_no for line_no, _ in errors] == error_lines
+
+
+def test_parse_quick_entry_line_limit():
+    rows, errors = parse_quick_entry("01.01.2025 А 1\n01.01.2025 Б 2\n01.01.2025 В 3", max_lines=2)
+    assert rows == []
+    assert [line_no for line_no, _ in errors] == [0]
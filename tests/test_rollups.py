@@ -0,0 +1,73 @@
+import asyncio
+from datetime import date, datetime
+
+import pytest
+
+import rollups
+from rollups import split_range
+
+
+@pytest.mark.parametrize("start_date, end_date, expected", [
+    # Межі збігаються з першим і останнім днем місяця
+    (datetime(2025, 1, 1), datetime(2025, 3, 31), (date(2025, 1, 1), date(2025, 3, 1))),
+    (datetime(2025, 1, 2), datetime(2025, 3, 31), (date(2025, 2, 1), date(2025, 3, 1))),
+    (datetime(2025, 1, 1), datetime(2025, 3, 30), (date(2025, 1, 1), date(2025, 2, 1))),
+    (datetime(2025, 1, 31), datetime(2025, 3, 1), (date(2025, 2, 1), date(2025, 2, 1))),
+    (datetime(2024, 12, 31), datetime(2025, 1, 31), (date(2025, 1, 1), date(2025, 1, 1))),
+    # Один місяць: повний, у високосний рік і неповний
+    (datetime(2025, 2, 1), datetime(2025, 2, 28), (date(2025, 2, 1), date(2025, 2, 1))),
+    (datetime(2024, 2, 1), datetime(2024, 2, 29), (date(2024, 2, 1), date(2024, 2, 1))),
+    (datetime(2024, 2, 1), datetime(2024, 2, 28), (None, None)),
+    (datetime(2025, 2, 2), datetime(2025, 2, 27), (None, None)),
+    (datetime(2025, 2, 1), datetime(2025, 2, 1), (None, None)),
+    # Відкриті періоди
+    (None, datetime(2025, 3, 31), (None, date(2025, 3, 1))),
+    (None, datetime(2025, 3, 15), (None, date(2025, 2, 1))),
+    (datetime(2025, 3, 1), None, (date(2025, 3, 1), None)),
+    (datetime(2025, 3, 15), None, (date(2025, 4, 1), None)),
+    (None, None, (None, None)),
+])
+def test_split_range(start_date, end_date, expected):
+    assert split_range(start_date, end_date) == expected
+
+
+async def write_expenses():
+    from database import AsyncSessionLocal, async_engine
+    from routers import create_user, post_expense, post_expenses, update_expense, delete_expense
+
+    telegram_id = 1001
+    try:
+        async with AsyncSessionLocal() as db:
+            await create_user(db, telegram_id, "test")
+            await post_expense(db, telegram_id, {"name": "Кава", "date": "31.01.2025", "amount": 80, "amount_usd": 2})
+            await post_expense(db, telegram_id, {"name": "Таксі", "date": "01.02.2025", "amount": 250})
+            expense_ids = await post_expenses(db, telegram_id, [
+                {"name": "Продукти", "date": datetime(2025, 2, 14), "uah": 1200, "usd": 29.27},
+                {"name": "Квитки", "date": datetime(2025, 3, 3), "uah": 3000, "usd": None},
+                {"name": "Книга", "date": datetime(2025, 3, 20), "uah": 450, "usd": 10.98},
+            ])
+
+            await update_expense(db, telegram_id, expense_ids[0], "Продукти", 1500, 41.0, date(2025, 2, 14))
+            await update_expense(db, telegram_id, expense_ids[1], "Квитки", 2800, 41.0)
+            assert await delete_expense(db, telegram_id, expense_ids[2], date(2025, 3, 20))
+            assert not await delete_expense(db, telegram_id, expense_ids[2])
+    finally:
+        await async_engine.dispose()
+
+
+def test_rollups_match_raw_sums_after_writes(expense_tables):
+    from database import SessionLocal
+    from models import ExpenseRollup
+
+    asyncio.run(write_expenses())
+
+    assert rollups.check() == []
+    with SessionLocal() as db:
+        stored = {row.month: row.count for row in db.query(ExpenseRollup).all()}
+    assert stored == {date(2025, 1, 1): 1, date(2025, 2, 1): 2, date(2025, 3, 1): 1}
+
+    # Перевірка справді порівнює суми: зіпсований підсумок знаходиться
+    with SessionLocal() as db:
+        db.query(ExpenseRollup).filter(ExpenseRollup.month == date(2025, 2, 1)).update({"uah_total": 0})
+        db.commit()
+    assert len(rollups.check()) == 1
@@ -0,0 +1,39 @@
+import time
+from collections import OrderedDict
+
+from bot.config import USER_CACHE_SIZE, USER_CACHE_TTL
+
+
+class UserIdCache:
+    def __init__(self, maxsize: int, ttl: int):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+
+    def get(self, telegram_id: int):
+        item = self._items.get(telegram_id)
+        if item is None:
+            return None
+
+        user_id, expires_at = item
+        if expires_at < time.monotonic():
+            del self._items[telegram_id]
+            return None
+
+        self._items.move_to_end(telegram_id)
+        return user_id
+
+    def set(self, telegram_id: int, user_id: int):
+        self._items[telegram_id] = (user_id, time.monotonic() + self.ttl)
+        self._items.move_to_end(telegram_id)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def invalidate(self, telegram_id: int = None):
+        if telegram_id is None:
+            self._items.clear()
+        else:
+            self._items.pop(telegram_id, None)
+
+
+user_ids = UserIdCache(USER_CACHE_SIZE, USER_CACHE_TTL)